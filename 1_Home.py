@@ -1,6 +1,6 @@
 import streamlit as st
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 
 # Code to run the app
 # python -m streamlit run 1_Home.py
@@ -29,7 +29,7 @@ with st.sidebar:
 # --- MAIN CONTENT ---
 st.title("🎯 FocusData: Productivity Hub")
 
-br_timezone = pytz.timezone('America/Sao_Paulo')
+br_timezone = ZoneInfo('America/Sao_Paulo')
 now_in_brazil = datetime.now(br_timezone)
 today = datetime.now(br_timezone).strftime("%A, %d %B %Y")
 st.markdown(f"*{today}*")
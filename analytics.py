@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+import reading
+import rollup
+
+
+def kpi_table(month_rollup, cards, month_days, streak_table):
+    """
+    One row per KPI card (index = category) with everything the Dashboard cards show:
+    performed minutes, goal of the month, progress and streaks.
+    month_rollup: daily rollup of the selected month, aggregated with a single groupby.
+    """
+    table = pd.DataFrame(cards).set_index("category")
+
+    performed = month_rollup.groupby("Category", observed=True)["minutes"].sum()
+    table["performed"] = performed.reindex(table.index).fillna(0)
+    table["goal"] = table["daily_goal"] * month_days
+    table["progress"] = (table["performed"] / table["goal"]).fillna(0)
+
+    table["streak"] = streak_table["current_streak"].reindex(table.index).fillna(0).astype(int)
+    table["longest_streak"] = streak_table["longest_streak"].reindex(table.index).fillna(0).astype(int)
+    return table
+
+
+DAYS_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def daily_evolution(month_rollup, start, end):
+    """
+    Hours per day (rows, every day between start and end) and category (columns).
+    """
+    hours = (month_rollup["minutes"] / 60).round(1)
+    evolution = hours.groupby([month_rollup["Date"], month_rollup["Category"]], observed=True).sum().unstack(fill_value=0)
+
+    all_days = pd.date_range(start=start, end=end, freq="D")
+    evolution = evolution.reindex(all_days, fill_value=0)
+    evolution.index = evolution.index.strftime("%d")
+    return evolution
+
+
+def category_distribution(month_rollup):
+    """
+    Average hours per session of every category = total minutes / sessions.
+    """
+    totals = month_rollup.groupby("Category", observed=True)[["minutes", "sessions"]].sum()
+    return (totals["minutes"] / totals["sessions"] / 60).round(2).sort_values(ascending=False)
+
+
+def weekday_pattern(month_rollup):
+    """
+    Average hours per session of every day of the week, as a dataframe (Day, hours).
+    """
+    day_of_week = pd.Categorical(month_rollup["Date"].dt.day_name(), categories=DAYS_ORDER, ordered=True)
+    totals = month_rollup.groupby(day_of_week, observed=False)[["minutes", "sessions"]].sum()
+    averages = (totals["minutes"] / totals["sessions"] / 60).round(2)
+
+    chart_data = averages.reset_index()
+    chart_data.columns = ["Day", "hours"]
+    return chart_data
+
+
+# Date ranges of the Dashboard range mode, ending today
+RANGE_PRESETS = ["Last 7 days", "Last 30 days", "Last 90 days", "This quarter", "This year"]
+
+# Days of the rolling averages
+ROLLING_WINDOWS = [7, 28]
+
+
+def preset_range(preset, today):
+    """
+    (start, end) of one of RANGE_PRESETS, both included.
+    """
+    today = pd.Timestamp(today).normalize()
+    if preset == "This quarter":
+        return today.to_period("Q").start_time, today
+    if preset == "This year":
+        return today.to_period("Y").start_time, today
+    days = int(preset.split()[1])
+    return today - pd.Timedelta(days=days - 1), today
+
+
+def resample_rule(start, end):
+    """
+    Size of the bars of a range: days up to two months, weeks up to one year, months after that.
+    """
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    if days <= 62:
+        return "D"
+    if days <= 366:
+        return "W"
+    return "MS"
+
+
+def daily_minutes(daily_rollup, start, end):
+    """
+    Minutes per day (rows, every day between start and end) and category (columns).
+    """
+    days = rollup.between(daily_rollup, start, end)
+    table = days.pivot_table(index="Date", columns="Category", values="minutes", aggfunc="sum", observed=True)
+    all_days = pd.date_range(start=pd.Timestamp(start).normalize(), end=pd.Timestamp(end).normalize(), freq="D")
+    return table.reindex(all_days).fillna(0)
+
+
+def _buckets(table, rule):
+    """
+    Sum a per day table by day, week (starting on Monday) or month.
+    """
+    if rule == "D":
+        return table
+    if rule == "W":
+        return table.resample("W-MON", label="left", closed="left").sum()
+    return table.resample(rule).sum()
+
+
+def range_evolution(daily_rollup, start, end):
+    """
+    Hours per day, week or month (see resample_rule) and category over the range, indexed by the first day.
+    """
+    rule = resample_rule(start, end)
+    return (_buckets(daily_minutes(daily_rollup, start, end), rule) / 60).round(1)
+
+
+def rolling_averages(daily_rollup, start, end, windows=ROLLING_WINDOWS):
+    """
+    Average hours per day of the last N days, for every day of the range: {N: days x category}.
+    The days before the range enter the first averages, so they do not start at zero.
+    """
+    lead = pd.Timedelta(days=max(windows) - 1)
+    daily = daily_minutes(daily_rollup, pd.Timestamp(start) - lead, end) / 60
+    return {
+        window: daily.rolling(window, min_periods=1).mean().loc[pd.Timestamp(start):].round(2)
+        for window in windows
+    }
+
+
+def year_over_year(daily_rollup, start, end):
+    """
+    Hours per category in the range and in the same days one year before, with the change (1.0 = +100%).
+    The change is empty for categories without hours one year before.
+    """
+    year = pd.DateOffset(years=1)
+    current = rollup.between(daily_rollup, start, end).groupby("Category", observed=True)["minutes"].sum()
+    previous = rollup.between(daily_rollup, pd.Timestamp(start) - year, pd.Timestamp(end) - year)
+    previous = previous.groupby("Category", observed=True)["minutes"].sum()
+
+    table = (pd.DataFrame({"hours": current, "last_year": previous}).fillna(0) / 60).round(1)
+    table["change"] = (table["hours"] / table["last_year"] - 1).where(table["last_year"] > 0)
+    return table.sort_values("hours", ascending=False)
+
+
+def year_over_year_evolution(daily_rollup, start, end):
+    """
+    Total hours per day, week or month of the range and of the same days one year before,
+    side by side (columns "This period" and "Year before").
+    """
+    year = pd.DateOffset(years=1)
+    current = daily_minutes(daily_rollup, start, end).sum(axis=1)
+    previous = daily_minutes(daily_rollup, pd.Timestamp(start) - year, pd.Timestamp(end) - year).sum(axis=1)
+    # Same calendar days on the same rows (29/02 goes to 28/02)
+    previous.index = previous.index + year
+    previous = previous.groupby(level=0).sum().reindex(current.index, fill_value=0)
+
+    rule = resample_rule(start, end)
+    table = _buckets(pd.DataFrame({"This period": current, "Year before": previous}), rule)
+    return (table / 60).round(1)
+
+
+def book_progress(books, progress):
+    """
+    Add Pages_Read, Last_Activity, Percentage, Finished, Status_Display and the updated Status
+    to the books dataframe.
+    progress: per book key index (see reading.py), a book is matched by the key of its name.
+    """
+    books = books.copy()
+    keys = reading.book_key(books["Name_book"].to_numpy())
+
+    books["Pages_Read"] = keys.map(progress["pages_read"]).fillna(0).to_numpy()
+    last_activity = keys.map(progress["last_activity"])
+    books["Last_Activity"] = pd.to_datetime(last_activity).dt.strftime("%Y-%m-%d").fillna("").to_numpy()
+    books["Percentage"] = (books["Pages_Read"] / books["Total_pages"] * 100).fillna(0)
+
+    finished = books["Pages_Read"] >= books["Total_pages"]
+    books["Finished"] = finished
+    books["Status_Display"] = np.where(finished, "✅ Finished (" + books["Last_Activity"] + ")", "📖 Reading")
+    books["Status"] = np.where(finished, "Finished", books["Status"].astype(object))
+    return books
@@ -0,0 +1,3 @@
+"""
+Benchmarks of the data layer and of the page computations, run with: python -m benchmarks.run
+"""
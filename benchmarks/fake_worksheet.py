@@ -0,0 +1,351 @@
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+# "A2:F10", "A2:F" (open end) or "A1"
+RANGE_PATTERN = re.compile(r"^([A-Z])(\d+)(?::([A-Z])(\d*))?$")
+
+
+def _column_position(letter):
+    return ord(letter) - ord("A")
+
+
+def _cell_text(value):
+    """
+    The values API answers formatted text, empty cells as "".
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value)
+
+
+class Latency:
+    """
+    Time a fake request takes: 'request' seconds per call plus 'per_row' seconds per row sent or received.
+    """
+
+    def __init__(self, request=0.0, per_row=0.0):
+        self.request = request
+        self.per_row = per_row
+
+    def wait(self, rows=0):
+        delay = self.request + self.per_row * rows
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeHttpError(Exception):
+    """
+    Same shape of googleapiclient HttpError: the status code is on 'resp.status'.
+    """
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status} (injected by the fake worksheet)")
+        self.resp = SimpleNamespace(status=status)
+
+
+class WorksheetNotFound(Exception):
+    """
+    Same name of the pygsheets error of a missing sheet (the backend checks the name, pygsheets is not imported).
+    """
+
+
+class Failures:
+    """
+    Failure injection: every request fails with probability 'rate', answering one of 'statuses'
+    (ex: 429 quota, 503 server). 'operations' limits the injection to some calls (ex: {"append_table"}).
+    """
+
+    def __init__(self, rate=0.0, statuses=(429,), operations=None, seed=0):
+        self.rate = rate
+        self.statuses = list(statuses)
+        self.operations = set(operations) if operations else None
+        self.injected = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def check(self, operation):
+        if self.rate <= 0 or (self.operations is not None and operation not in self.operations):
+            return
+        with self._lock:
+            failed = self._random.random() < self.rate
+            status = self._random.choice(self.statuses)
+            if failed:
+                self.injected += 1
+        if failed:
+            raise FakeHttpError(status)
+
+
+class FakeWorksheet:
+    """
+    In-memory worksheet with the pygsheets methods the storage backend uses:
+    get_as_df, append_table, update_values, update_values_batch, clear and set_dataframe.
+    Every call waits the configured latency and is counted on 'calls'.
+    """
+
+    def __init__(self, title, df, spreadsheet, sheet_id=0):
+        self.title = title
+        self.id = sheet_id
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.columns = list(df.columns)
+        # Object columns, a sheet cell can hold any value
+        self._frame = df.astype(object).reset_index(drop=True)
+        # Appended rows wait here, so an append does not copy the whole frame
+        self._tail = []
+        self._lock = threading.Lock()
+
+    # ----------------------- HELPERS -----------------------
+
+    @property
+    def frame(self):
+        if self._tail:
+            tail = pd.DataFrame(self._tail, columns=self.columns, dtype=object)
+            self._frame = pd.concat([self._frame, tail], ignore_index=True)
+            self._tail = []
+        return self._frame
+
+    @property
+    def row_count(self):
+        return len(self._frame) + len(self._tail)
+
+    def values(self, first_row=1, last_row=None, first_col=0, last_col=None):
+        """
+        Cells of the sheet range as a list of rows of text (row 1 is the header).
+        """
+        with self._lock:
+            frame = self.frame
+            last_row = last_row or len(frame) + 1
+            last_col = len(self.columns) - 1 if last_col is None else last_col
+
+            rows = []
+            if first_row == 1:
+                rows.append(self.columns[first_col:last_col + 1])
+            start = max(first_row, 2) - 2
+            block = frame.iloc[start:max(last_row - 1, start), first_col:last_col + 1]
+            rows.extend([_cell_text(value) for value in row] for row in block.itertuples(index=False))
+            return rows
+
+    def _widen(self, width):
+        """
+        Add empty columns until the sheet has 'width' columns (a write after the last column).
+        """
+        frame = self.frame
+        while len(self.columns) < width:
+            name = f"Column {len(self.columns) + 1}"
+            self.columns.append(name)
+            frame[name] = ""
+        self._frame = frame
+
+    def _set_range(self, crange, values):
+        match = RANGE_PATTERN.match(crange.split("!")[-1])
+        first_col = _column_position(match.group(1))
+        first_row = int(match.group(2))
+        for row_offset, row in enumerate(values):
+            self._widen(first_col + len(row))
+            position = first_row + row_offset - 2
+            if position < 0:
+                # Row 1 is the header (a new sheet gets its columns this way)
+                self.columns[first_col:first_col + len(row)] = [str(value) for value in row]
+                self._frame = self.frame.set_axis(self.columns, axis=1)
+                continue
+            for col_offset, value in enumerate(row):
+                self.frame.iat[position, first_col + col_offset] = value
+
+    # ----------------------- PYGSHEETS API -----------------------
+
+    @property
+    def cols(self):
+        return len(self.columns)
+
+    def add_cols(self, count):
+        with self._lock:
+            self._widen(len(self.columns) + count)
+
+    def get_as_df(self, has_header=True, **kwargs):
+        self.client.called("get_as_df")
+        with self._lock:
+            frame = self.frame.copy()
+        self.client.latency.wait(len(frame))
+        return frame
+
+    def append_table(self, values, start="A1", end=None, dimension="ROWS", overwrite=False, **kwargs):
+        self.client.called("append_table")
+        self.client.latency.wait(len(values))
+        with self._lock:
+            first_row = self.row_count + 2
+            self._widen(max(len(row) for row in values))
+            for row in values:
+                self._tail.append(list(row) + [""] * (len(self.columns) - len(row)))
+        # Same shape the backend reads from the pygsheets answer
+        updated_range = SimpleNamespace(start=SimpleNamespace(row=first_row))
+        return {"updates": {"updatedRange": updated_range}}
+
+    def update_values(self, crange=None, values=None, **kwargs):
+        self.client.called("update_values")
+        self.client.latency.wait(len(values))
+        with self._lock:
+            self._set_range(crange, values)
+
+    def update_values_batch(self, ranges, values, **kwargs):
+        self.client.called("update_values_batch")
+        self.client.latency.wait(sum(len(rows) for rows in values))
+        with self._lock:
+            for crange, rows in zip(ranges, values):
+                self._set_range(crange, rows)
+
+    def clear(self, **kwargs):
+        self.client.called("clear")
+        self.client.latency.wait()
+        with self._lock:
+            self._frame = self._frame.iloc[0:0]
+            self._tail = []
+
+    def apply_request(self, request):
+        """
+        Apply one request of spreadsheets.batchUpdate (updateCells, appendCells or deleteDimension).
+        """
+        def value(cell):
+            entered = cell.get("userEnteredValue", {})
+            number = entered.get("numberValue")
+            if number is not None:
+                return int(number) if float(number).is_integer() else number
+            return entered.get("stringValue", "")
+
+        with self._lock:
+            if "updateCells" in request:
+                body = request["updateCells"]
+                row_index, column_index = body["start"]["rowIndex"], body["start"]["columnIndex"]
+                for row_offset, row in enumerate(body["rows"]):
+                    for col_offset, cell in enumerate(row["values"]):
+                        self.frame.iat[row_index - 1 + row_offset, column_index + col_offset] = value(cell)
+            elif "appendCells" in request:
+                for row in request["appendCells"]["rows"]:
+                    cells = [value(cell) for cell in row["values"]]
+                    self._tail.append(cells + [""] * (len(self.columns) - len(cells)))
+            elif "deleteDimension" in request:
+                span = request["deleteDimension"]["range"]
+                # Sheet row index 1 is the frame position 0 (index 0 is the header)
+                frame = self.frame
+                keep = [position for position in range(len(frame))
+                        if not span["startIndex"] - 1 <= position < span["endIndex"] - 1]
+                self._frame = frame.iloc[keep].reset_index(drop=True)
+
+    def set_dataframe(self, df, start, **kwargs):
+        self.client.called("set_dataframe")
+        self.client.latency.wait(len(df))
+        with self._lock:
+            self.columns = list(df.columns)
+            self._frame = df.astype(object).reset_index(drop=True)
+            self._tail = []
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, sheets):
+        self.id = "fake-spreadsheet"
+        self.client = client
+        self.sheets = {
+            title: FakeWorksheet(title, df, self, sheet_id) for sheet_id, (title, df) in enumerate(sheets.items())
+        }
+
+    def worksheets(self, sheet_property=None, value=None, force_fetch=False):
+        if not sheet_property:
+            return list(self.sheets.values())
+        # pygsheets fetches the sheet list again when the filter finds nothing
+        self.client.called("fetch_sheets")
+        found = [sheet for sheet in self.sheets.values() if getattr(sheet, sheet_property) == value]
+        if not found:
+            raise WorksheetNotFound(value)
+        return found
+
+    def worksheet_by_title(self, title):
+        if title not in self.sheets:
+            raise WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title, rows=100, cols=26, **kwargs):
+        self.client.called("add_worksheet")
+        self.client.latency.wait()
+        self.sheets[title] = FakeWorksheet(title, pd.DataFrame(), self, len(self.sheets))
+        return self.sheets[title]
+
+
+class FakeSheetAPI:
+    """
+    The low level API of the client (client.sheet): spreadsheets.batchUpdate.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def batch_update(self, spreadsheet_id, requests, **kwargs):
+        self.client.called("batch_update")
+        self.client.latency.wait(len(requests))
+        worksheets = {sheet.id: sheet for sheet in self.client.spreadsheet.worksheets()}
+        for request in requests:
+            body = next(iter(request.values()))
+            sheet_id = body.get("sheetId", body.get("start", body.get("range", {})).get("sheetId"))
+            worksheets[sheet_id].apply_request(request)
+
+
+class FakeClient:
+    """
+    Fake pygsheets client: opens the fake spreadsheet and answers batched value requests (get_range).
+    """
+
+    def __init__(self, sheets, latency=None, failures=None):
+        self.latency = latency or Latency()
+        self.failures = failures or Failures()
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.spreadsheet = FakeSpreadsheet(self, sheets)
+        self.sheet = FakeSheetAPI(self)
+
+    def called(self, operation):
+        """
+        Count the call and raise the injected failure, if any (before the call changes anything).
+        """
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        self.failures.check(operation)
+
+    def open_by_url(self, url):
+        return self.spreadsheet
+
+    def get_range(self, spreadsheet_id, value_ranges=None, **kwargs):
+        self.called("get_range")
+        results = []
+        for label in value_ranges:
+            title, _, crange = label.partition("!")
+            worksheet = self.spreadsheet.worksheet_by_title(title.strip("'"))
+            if not crange:
+                rows = worksheet.values()
+            else:
+                match = RANGE_PATTERN.match(crange)
+                last_row = match.group(4)
+                rows = worksheet.values(
+                    first_row=int(match.group(2)),
+                    last_row=int(last_row) if last_row else None,
+                    first_col=_column_position(match.group(1)),
+                    last_col=_column_position(match.group(3) or match.group(1)),
+                )
+            # The API answers [['']] for an empty range
+            results.append(rows or [[""]])
+        self.latency.wait(sum(len(rows) for rows in results))
+        return results
+
+
+def fake_backend(sheets, latency=None, failures=None, scheduler=None):
+    """
+    SheetsBackend connected to a FakeClient with the given sheets ({sheet name: dataframe}).
+    Return (backend, client), the client keeps the call counters.
+    """
+    from storage.sheets import SheetsBackend
+
+    client = FakeClient(sheets, latency, failures)
+    backend = SheetsBackend(url="fake://spreadsheet", authorize=lambda: client, scheduler=scheduler)
+    return backend, client
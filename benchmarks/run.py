@@ -0,0 +1,276 @@
+"""
+Time the data layer and the page computations on synthetic histories and write the results as JSON.
+
+    python -m benchmarks.run --sizes 10000 100000 --output benchmark_results.json
+    python -m benchmarks.run --baseline old_results.json
+
+The storage is a fake worksheet (benchmarks/fake_worksheet.py) with configurable latency,
+so no Google credentials are needed.
+"""
+import argparse
+import calendar
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+
+# No snapshots and no journal: every case must measure the same work on every run
+os.environ.setdefault("FOCUSDATA_SNAPSHOTS", "false")
+os.environ.setdefault("FOCUSDATA_WRITE_BEHIND", "false")
+# The fake has no quota: the rate limit must not be part of the timings, and backoffs are short
+os.environ.setdefault("FOCUSDATA_SHEETS_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("FOCUSDATA_SHEETS_REQUEST_BURST", "1000")
+os.environ.setdefault("FOCUSDATA_SHEETS_BACKOFF_BASE", "0.01")
+
+import pandas as pd
+
+import analytics
+import database
+import metrics
+import reading
+import rollup
+import storage
+import streaks
+from benchmarks import synthetic
+from benchmarks.fake_worksheet import Failures, Latency, fake_backend
+from config import kpi_cards
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def measure(function, repeat, setup=None):
+    """
+    Run function() 'repeat' times (setup() before each run, not timed) and return the timings in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "runs": repeat,
+    }
+
+
+def _expire(sheet_name):
+    """
+    Make the cache entry of the sheet old, the next get_df goes to the storage.
+    """
+    with database._cache_lock:
+        entry = database._df_cache.get(sheet_name)
+        if entry is not None:
+            entry["loaded_at"] = 0
+
+
+def computation_cases(sheets):
+    """
+    Page computations on typed frames, the same calls the pages make.
+    """
+    records = database._normalize("database", sheets["database"])
+    books = database._normalize("books_library_d", sheets["books_library_d"])
+
+    daily = rollup.build_rollup(records)
+    first_day, last_day = daily["Date"].min(), daily["Date"].max()
+    month_days = calendar.monthrange(last_day.year, last_day.month)[1]
+    month_start = last_day.replace(day=1)
+    month_end = last_day.replace(day=month_days)
+    month = rollup.between(daily, month_start, month_end)
+    runs = streaks.streak_runs(daily)
+    streak_table = streaks.streak_summary(runs, last_day.date())
+    cards = kpi_cards()
+    reading_log = reading.build_log(records)
+    progress = reading.build_progress(reading_log)
+    new_read = records[records["Category"] == "Read"].tail(1)
+
+    return {
+        "normalize_records": lambda: database._normalize("database", sheets["database"]),
+        "book_index_build": lambda: reading.build_progress(reading.build_log(records)),
+        "book_index_update": lambda: reading.update_progress(
+            progress, *reading.apply_changes(reading_log, added=new_read)
+        ),
+        "book_progress": lambda: analytics.book_progress(books, progress),
+        "build_rollup": lambda: rollup.build_rollup(records),
+        "streak_runs": lambda: streaks.streak_runs(daily),
+        "streak_summary": lambda: streaks.streak_summary(runs, last_day.date()),
+        "kpi_table": lambda: analytics.kpi_table(month, cards, month_days, streak_table),
+        "daily_evolution": lambda: analytics.daily_evolution(month, month_start, month_end),
+        "category_distribution": lambda: analytics.category_distribution(month),
+        "weekday_pattern": lambda: analytics.weekday_pattern(month),
+        # Range mode of the Dashboard over the full history
+        "range_evolution": lambda: analytics.range_evolution(daily, first_day, last_day),
+        "rolling_averages": lambda: analytics.rolling_averages(daily, first_day, last_day),
+        "year_over_year": lambda: analytics.year_over_year_evolution(daily, first_day, last_day),
+    }
+
+
+def storage_cases(sheets, latency, failures=None):
+    """
+    database.py calls through the SheetsBackend, connected to a fake worksheet.
+    """
+    backend, client = fake_backend(sheets, latency, failures)
+    storage.set_backend(backend)
+    database.clear_cache()
+    database.get_df("database")
+
+    def clear():
+        database.clear_cache()
+
+    month_start = pd.Timestamp.today().normalize().replace(day=1)
+
+    def expire():
+        _expire("database")
+
+    def update():
+        record_id = database._df_cache["database"]["df"]["ID"].iloc[-1]
+        database.update_records([(record_id, {"Notes": "benchmark", "Duration": 42})])
+
+    cases = {
+        "get_df_full": (lambda: database.get_df("database"), clear),
+        "get_df_cached": (lambda: database.get_df("database"), None),
+        "get_df_incremental": (lambda: database.get_df("database"), expire),
+        "get_many": (lambda: database.get_many(["books_library_d", "database", "weekly_planner"]), clear),
+        "save_record": (lambda: database.save_record("2024-01-01", "10:00", "Studies", "", 30, 0), None),
+        "update_records": (update, None),
+        "query_month": (lambda: database.query("database", month_start, None, ["Read"], ["Date", "Notes", "Pages"]), None),
+    }
+    return cases, client
+
+
+def scheduler_cases(sheets, latency, threads=8, saves=20, fail_rate=0.2):
+    """
+    The request scheduler under concurrency: identical reads at the same time (coalesced into
+    one request) and a burst of saves while the fake answers 429/503 to part of the requests.
+    Return {case: {"seconds", "requests", "injected", "retries", "errors"}}.
+    """
+    results = {}
+
+    backend, client = fake_backend(sheets, latency)
+    storage.set_backend(backend)
+    barrier = threading.Barrier(threads)
+
+    def read():
+        barrier.wait()
+        storage.get_backend().read("database")
+
+    workers = [threading.Thread(target=read) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results["concurrent_reads"] = {
+        "seconds": time.perf_counter() - start,
+        "callers": threads,
+        "requests": client.calls.get("get_as_df", 0),
+    }
+
+    metrics.reset()
+    failures = Failures(fail_rate, statuses=(429, 503))
+    backend, client = fake_backend(sheets, latency, failures)
+    storage.set_backend(backend)
+    database.clear_cache()
+    database.get_df("database")
+
+    errors = 0
+    start = time.perf_counter()
+    for number in range(saves):
+        try:
+            backend.append_rows("database", [["2024-01-01", "10:00", "Studies", f"burst {number}", 30, 0]])
+        except Exception:
+            errors += 1
+    table = metrics.summary()
+    results["burst_saves_with_failures"] = {
+        "seconds": time.perf_counter() - start,
+        "saves": saves,
+        "requests": client.calls.get("append_table", 0),
+        "injected": failures.injected,
+        "retries": int(sum(value for (counter, _), value in metrics.counters().items() if counter.startswith("retry_"))),
+        "errors": errors,
+        "metrics_errors": int(table["errors"].sum()) if not table.empty else 0,
+    }
+    database.clear_cache()
+    return results
+
+
+def run(sizes, repeat, latency, fail_rate=0.0):
+    results = []
+    for size in sizes:
+        sheets = synthetic.history(size)
+        print(f"{size} rows", file=sys.stderr)
+
+        for name, function in computation_cases(sheets).items():
+            timing = measure(function, repeat)
+            results.append({"size": size, "group": "computation", "name": name, **timing})
+            print(f"  {name:<24} {timing['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+
+        failures = Failures(fail_rate, statuses=(429, 503)) if fail_rate else None
+        cases, client = storage_cases(sheets, latency, failures)
+        for name, (function, setup) in cases.items():
+            timing = measure(function, repeat, setup)
+            results.append({"size": size, "group": "storage", "name": name, **timing})
+            print(f"  {name:<24} {timing['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+        database.clear_cache()
+
+        for name, values in scheduler_cases(sheets, latency).items():
+            results.append({"size": size, "group": "scheduler", "name": name, "median_s": values["seconds"], **values})
+            print(f"  {name:<24} {values}", file=sys.stderr)
+
+    return results
+
+
+def compare(results, baseline_path):
+    """
+    Print the ratio new / baseline of every case found on both files (> 1 is slower).
+    """
+    with open(baseline_path) as file:
+        baseline = {(item["size"], item["name"]): item["median_s"] for item in json.load(file)["results"]}
+
+    for item in results:
+        old = baseline.get((item["size"], item["name"]))
+        if old:
+            ratio = item["median_s"] / old
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{item['size']:>9} {item['name']:<24} x{ratio:6.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data layer and the page computations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="rows of the records sheet")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every case (the median is reported)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of every fake request")
+    parser.add_argument("--latency-per-row", type=float, default=0.0, help="seconds per row of every fake request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of fake requests answered 429/503")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file of the results")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    latency = Latency(args.latency, args.latency_per_row)
+    results = run(args.sizes, args.repeat, latency, args.fail_rate)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "latency": {"request_s": args.latency, "per_row_s": args.latency_per_row},
+        "fail_rate": args.fail_rate,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved on {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Startup budget of the pages: time of the first render in a new Python process, and the heavy
+modules that render loaded.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --rows 100000 --output startup_results.json
+    python -m benchmarks.startup --storage fake
+
+Every page runs in its own process, like the first visit after the server started (Streamlit is
+already loaded, the app modules are not). The storage is a local SQLite file with a synthetic
+history, so no Google credentials are needed. With --storage fake the pages use the Sheets backend
+on the fake worksheet instead: the fake and its data are built before the timer (so pandas is not
+counted), and pygsheets must not be loaded as no real Sheets call happens.
+A page over its budget, or loading a module it should not, is flagged and the command exits with 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds of the first render of every page, and modules it must not load (they are loaded on first use)
+PAGE_BUDGETS = {
+    "1_Home.py": {"first_render_s": 0.5, "forbidden": ["pandas", "altair", "pygsheets"]},
+    "pages/2_Record_Activities.py": {"first_render_s": 2.5, "forbidden": ["altair", "pygsheets"]},
+    "pages/2_Routines.py": {"first_render_s": 2.5, "forbidden": ["altair", "pygsheets"]},
+    "pages/3_Dashboard.py": {"first_render_s": 3.0, "forbidden": ["pygsheets"]},
+}
+
+# Modules reported on the results when a page loads them
+WATCHED_MODULES = ["pandas", "numpy", "pyarrow", "altair", "pygsheets", "googleapiclient", "pytz"]
+
+
+def render_page(page, storage_kind="sqlite", rows=0):
+    """
+    Run inside the child process: time the first render and a rerun of the page, return the results.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    if storage_kind == "fake":
+        import storage
+        from benchmarks import synthetic
+        from benchmarks.fake_worksheet import fake_backend
+
+        storage.set_backend(fake_backend(synthetic.history(rows))[0])
+
+    loaded_before = set(sys.modules)
+    app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    # The pages read the admin password from the secrets (nobody logs in here)
+    app.secrets["admin_password"] = "startup"
+
+    start = time.perf_counter()
+    app.run()
+    first_render = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app.run()
+    rerun = time.perf_counter() - start
+
+    loaded = set(sys.modules) - loaded_before
+    return {
+        "page": page,
+        "first_render_s": first_render,
+        "rerun_s": rerun,
+        "modules": len(loaded),
+        "heavy_modules": [module for module in WATCHED_MODULES if module in loaded],
+        "exceptions": [str(exception.value) for exception in app.exception],
+    }
+
+
+def seed_database(path, rows):
+    """
+    SQLite file with a synthetic history of 'rows' records.
+    """
+    from benchmarks import synthetic
+    from storage.sqlite import SQLiteBackend
+
+    backend = SQLiteBackend(path)
+    for sheet_name, df in synthetic.history(rows).items():
+        backend.replace(sheet_name, df)
+
+
+def run(rows, storage_kind="sqlite"):
+    """
+    Render every page in a new process. Return one result per page.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "startup.sqlite")
+        if storage_kind == "sqlite":
+            seed_database(path, rows)
+
+        env = dict(
+            os.environ,
+            FOCUSDATA_STORAGE_BACKEND="sqlite",
+            FOCUSDATA_SQLITE_PATH=path,
+            FOCUSDATA_SNAPSHOTS="false",
+            FOCUSDATA_WRITE_BEHIND="false",
+            # The fake has no quota
+            FOCUSDATA_SHEETS_REQUESTS_PER_MINUTE="1000000",
+            FOCUSDATA_SHEETS_REQUEST_BURST="1000",
+            PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        )
+        for page in PAGE_BUDGETS:
+            child = subprocess.run(
+                [sys.executable, "-m", "benchmarks.startup", "--child", page,
+                 "--storage", storage_kind, "--rows", str(rows)],
+                cwd=ROOT, env=env, capture_output=True, text=True,
+            )
+            if child.returncode != 0:
+                raise RuntimeError(f"{page} did not render:\n{child.stderr[-2000:]}")
+            # The last line of the output is the result, Streamlit may log before it
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            result["rows"] = rows
+            result["storage"] = storage_kind
+            results.append(result)
+    return results
+
+
+def check_budgets(results):
+    """
+    Print every page with its budget. Return the number of pages over the budget or with forbidden modules.
+    """
+    failures = 0
+    for result in results:
+        budget = PAGE_BUDGETS[result["page"]]
+        problems = []
+        if result["first_render_s"] > budget["first_render_s"]:
+            problems.append(f"over the budget of {budget['first_render_s']:.1f}s")
+        forbidden = [module for module in budget["forbidden"] if module in result["heavy_modules"]]
+        if forbidden:
+            problems.append(f"loaded {', '.join(forbidden)}")
+        if result["exceptions"]:
+            problems.append(f"exceptions: {result['exceptions']}")
+        failures += bool(problems)
+
+        flag = f"  <-- {'; '.join(problems)}" if problems else ""
+        print(
+            f"{result['page']:<30} first {result['first_render_s'] * 1000:8.0f} ms"
+            f"  rerun {result['rerun_s'] * 1000:7.0f} ms  modules {result['modules']:5d}{flag}",
+            file=sys.stderr,
+        )
+    return failures
+
+
+def compare(results, baseline_path):
+    """
+    Print the ratio new / baseline of the first render of every page (> 1 is slower).
+    """
+    with open(baseline_path) as file:
+        baseline = {item["page"]: item["first_render_s"] for item in json.load(file)["results"]}
+
+    for item in results:
+        old = baseline.get(item["page"])
+        if old:
+            ratio = item["first_render_s"] / old
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{item['page']:<30} x{ratio:6.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the first render of every page against its budget.")
+    parser.add_argument("--rows", type=int, default=10_000, help="rows of the records sheet")
+    parser.add_argument("--storage", choices=["sqlite", "fake"], default="sqlite", help="storage of the pages")
+    parser.add_argument("--output", default="startup_results.json", help="JSON file of the results")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare with")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(render_page(args.child, args.storage, args.rows)))
+        return 0
+
+    results = run(args.rows, args.storage)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "rows": args.rows,
+        "storage": args.storage,
+        "budgets": PAGE_BUDGETS,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    failures = check_budgets(results)
+    print(f"Results saved on {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        compare(results, args.baseline)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from config import CATEGORIES
+
+# Minutes of a session of every category: (mean, standard deviation)
+SESSION_MINUTES = {
+    "Studies": (70, 30),
+    "English": (30, 10),
+    "Read": (35, 15),
+    "Personal projects": (60, 30),
+    "Workout": (55, 15),
+}
+
+PLANNER_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def book_names(count):
+    return [f"Book {number:04d}" for number in range(1, count + 1)]
+
+
+def records(rows, books=50, per_day=3, end=None, seed=0):
+    """
+    Activity history with 'rows' records, about 'per_day' records per day until 'end' (default today).
+    The dataframe has the sheet columns with the values get_as_df returns (dates as text, numbers as int).
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    days = max(rows // per_day, 1)
+
+    # Random days of the period, sorted like the sheet (new records are appended at the bottom)
+    offsets = np.sort(rng.integers(0, days, size=rows))[::-1]
+    dates = end - pd.to_timedelta(offsets, unit="D")
+
+    categories = rng.choice(CATEGORIES, size=rows)
+    means = np.array([SESSION_MINUTES.get(category, (45, 15))[0] for category in CATEGORIES])
+    deviations = np.array([SESSION_MINUTES.get(category, (45, 15))[1] for category in CATEGORIES])
+    positions = pd.Index(CATEGORIES).get_indexer(categories)
+    duration = np.clip(rng.normal(means[positions], deviations[positions]), 5, 240).astype(int)
+
+    is_read = categories == "Read"
+    names = np.array(book_names(books))
+    notes = np.where(is_read, names[rng.integers(0, books, size=rows)], "")
+    pages = np.where(is_read, rng.integers(5, 60, size=rows), 0)
+
+    minutes_of_day = rng.integers(6 * 60, 23 * 60, size=rows)
+    times = [f"{value // 60:02d}:{value % 60:02d}" for value in minutes_of_day]
+
+    return pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Time": times,
+        "Category": categories,
+        "Notes": notes,
+        "Duration": duration,
+        "Pages": pages,
+        "ID": [f"r{number:015x}" for number in range(rows)],
+    })
+
+
+def books(count=50, seed=0):
+    """
+    Books library with 'count' books, every one "Reading".
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Name_book": book_names(count),
+        "Author": [f"Author {number % 20:02d}" for number in range(count)],
+        "Total_pages": rng.integers(120, 900, size=count),
+        "Status": "Reading",
+        "ID": [f"b{number:015x}" for number in range(count)],
+    })
+
+
+def planner(per_day=4):
+    """
+    Weekly planner with 'per_day' activities on every day of the week.
+    """
+    rows = []
+    for day in PLANNER_DAYS:
+        for position, category in enumerate(CATEGORIES[:per_day]):
+            rows.append({"Day": day, "Activity": category, "Notes": "", "Time": 30 + 15 * position})
+    return pd.DataFrame(rows, columns=["Day", "Activity", "Notes", "Time"])
+
+
+def history(rows, books_count=50, seed=0):
+    """
+    The three sheets of the app: {sheet name: dataframe}.
+    """
+    return {
+        "database": records(rows, books=books_count, seed=seed),
+        "books_library_d": books(books_count, seed=seed),
+        "weekly_planner": planner(),
+    }
@@ -0,0 +1,43 @@
+import os
+import streamlit as st
+
+
+def setting(name, default):
+    """
+    Read a config value from the environment (FOCUSDATA_<NAME>) or from st.secrets.
+    The environment wins, so scripts and local runs can change it without a secrets.toml.
+    """
+    env_value = os.environ.get(f"FOCUSDATA_{name.upper()}")
+    if env_value is not None:
+        return env_value
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        # No secrets.toml available (ex: running a script outside Streamlit)
+        pass
+    return default
+
+
+# Activity categories and the Dashboard KPI cards: icon, title and daily goal (minutes) of each one.
+# A goal can be changed without code on st.secrets, ex: [daily_goals] Studies = 90
+KPI_CARDS = [
+    {"icon": "📚", "title": "Studies", "category": "Studies", "daily_goal": 60},
+    {"icon": "🌍", "title": "English", "category": "English", "daily_goal": 30},
+    {"icon": "📖", "title": "Reading", "category": "Read", "daily_goal": 30},
+    {"icon": "🛠️", "title": "Projects", "category": "Personal projects", "daily_goal": 30},
+    {"icon": "🏋️‍♂️", "title": "Workout", "category": "Workout", "daily_goal": 60},
+]
+
+CATEGORIES = [card["category"] for card in KPI_CARDS]
+
+
+def kpi_cards():
+    """
+    KPI_CARDS with the daily goals overridden by the 'daily_goals' setting.
+    """
+    goals = setting("daily_goals", {}) or {}
+    return [
+        dict(card, daily_goal=float(goals.get(card["category"], card["daily_goal"])))
+        for card in KPI_CARDS
+    ]
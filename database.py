@@ -1,192 +1,1325 @@
 import pandas as pd
 import streamlit as st
-import os
-import pygsheets
+import threading
+import time
+
 import json
+import zlib
+
+import metrics
+import paging
+import partitions
+import reading
+import rollup
+import streaks
+from config import setting
+from storage import ID_COLUMN, SHEET_COLUMNS, base_sheet, get_backend, new_id, sheet_columns, snapshot
+from storage.journal import WriteJournal
+
+# Column order of the records sheet ("database"), from column A to G
+RECORD_COLUMNS = SHEET_COLUMNS["database"]
+
+# Declared type of every column. get_df returns frames already converted, the conversion runs once
+# per download and the cache keeps the typed frame (categories and int32 use a fraction of the memory).
+SCHEMAS = {
+    "database": {
+        "Date": "datetime",
+        "Time": "text",
+        "Category": "category",
+        "Notes": "text",
+        "Duration": "int32",
+        "Pages": "int32",
+        "ID": "text",
+        "ID_Google": "int32",
+    },
+    "books_library_d": {
+        "Name_book": "text",
+        "Author": "text",
+        "Total_pages": "int32",
+        "Status": "category",
+        "ID": "text",
+        "ID_Google": "int32",
+    },
+    "weekly_planner": {
+        "Day": "text",
+        "Activity": "text",
+        "Notes": "text",
+        "Time": "int32",
+        "ID_Google": "int32",
+    },
+    "database_partitions": {
+        "Sheet": "text",
+        "First_Date": "datetime",
+        "Last_Date": "datetime",
+        "Rows": "int32",
+        "Aggregates": "text",
+        "ID_Google": "int32",
+    },
+    "database_rollup": {
+        "Date": "datetime",
+        "Category": "text",
+        "minutes": "int32",
+        "pages": "int32",
+        "sessions": "int32",
+        "ID_Google": "int32",
+    },
+    "database_reading": {
+        "key": "text",
+        "Date": "datetime",
+        "pages": "int32",
+        "records": "int32",
+        "ID_Google": "int32",
+    },
+}
+
+
+def _convert(series, kind):
+    """
+    Convert one column to the type declared on SCHEMAS.
+    """
+    if kind == "datetime":
+        return pd.to_datetime(series, errors="coerce")
+    if kind == "int32":
+        # Converte vazio para 0 e texto para número
+        return pd.to_numeric(series, errors="coerce").fillna(0).astype("int32")
+    text = series.astype(object).where(series.notna(), "").astype(str)
+    if kind == "category":
+        return text.astype("category")
+    return text
+
+
+def _normalize(sheet_name, df):
+    """
+    Return the dataframe with the columns of the sheet converted to the types of SCHEMAS.
+    Missing columns are created empty, so even an empty sheet has the right columns and types.
+    """
+    schema = SCHEMAS.get(base_sheet(sheet_name))
+    if schema is None:
+        return df
+
+    with metrics.timed("normalize", sheet_name) as event:
+        df = df.copy()
+        for column, kind in schema.items():
+            if column not in df.columns:
+                if column == "ID_Google":
+                    continue
+                df[column] = pd.Series(index=df.index, dtype=object)
+            df[column] = _convert(df[column], kind)
+        event["rows"] = len(df)
+    return df
+
+
+def _concat(sheet_name, frames):
+    """
+    pd.concat of typed frames. Categories are restored when the frames had different ones.
+    """
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    df = pd.concat(frames, ignore_index=True)
+    for column, kind in SCHEMAS.get(base_sheet(sheet_name), {}).items():
+        if kind == "category" and column in df.columns and df[column].dtype != "category":
+            df[column] = df[column].astype("category")
+    return df
+
+
+def _set_cells(sheet_name, df, mask, cells):
+    """
+    Write {column: value} on the rows of the mask, converting the values to the column types.
+    """
+    schema = SCHEMAS.get(base_sheet(sheet_name), {})
+    for column, value in cells.items():
+        kind = schema.get(column, "text")
+        typed = _convert(pd.Series([value]), kind).iloc[0]
+        if kind == "category" and typed not in df[column].cat.categories:
+            df[column] = df[column].cat.add_categories([typed])
+        df.loc[mask, column] = typed
 
-'''
-# Use to reserve the local memory and to prevent the app from having to read code all the time.
-@st.cache_resource
-'''
 
-def get_worksheet(sheet_name):
+def _padded(rows, columns):
     """
-    Function:
-    Check if 'credentials.json' exists (Local Use on PC).
-    It connects to my Google Sheets file via the Google Cloud API.
-    Open and get all records of my database (file).
+    Rows as long as the columns (rows saved by an older version have no ID).
     """
+    return [list(row) + [""] * (len(columns) - len(row)) for row in rows]
+
+
+# Sheets whose rows keep a stable id on the ID column (and the archives of the records)
+ID_SHEETS = {"database", "books_library_d"}
+
+
+def _numeric_ids(ids):
+    """
+    Ids that look like a number. Older versions made ids of 16 hex digits, and a few of them (only
+    digits, or digits and one "e") were read back from the sheet as numbers.
+    """
+    return pd.to_numeric(ids.where(ids != ""), errors="coerce").notna()
+
+
+def _ensure_ids(sheet_name, df, taken=None):
+    """
+    Give an id to the rows without one (saved by an older version or typed on the sheet by hand), with
+    the id of another row (a copied row) or with an id the sheet turned into a number, and save the new
+    ids on the storage with one request.
+    taken: ids already used by other rows (the cached ones, when df has only the new rows).
+    """
+    if base_sheet(sheet_name) not in ID_SHEETS or df.empty:
+        return df
+    blank = (df[ID_COLUMN] == "") | df[ID_COLUMN].duplicated() | _numeric_ids(df[ID_COLUMN])
+    if taken is not None:
+        blank |= df[ID_COLUMN].isin(taken)
+    blank &= df["ID_Google"] > 0
+    if not blank.any():
+        return df
+
+    ids = {int(row_id): new_id() for row_id in df.loc[blank, "ID_Google"]}
     try:
-        # STRATEGY 1: (Local Use on PC)
-        if os.path.exists("credentials.json"):
-            credentials = pygsheets.authorize(service_file="credentials.json")
-        # STRATEGY 1: (Cloud Mode - Streamlit CLoud) - Use st.secrets
-        else:
-            # Pygsheets needs a JSON string, so we converted the secrets dictionary.
-            if "gcp_service_account" in st.secrets:
-                service_account_info = st.secrets["gcp_service_account"]
-                # Convert the dictionary back to a JSON text
-                json_creds = json.dumps(dict(service_account_info))
-                credentials = pygsheets.authorize(service_account_json=json_creds)
-            else:
-                st.error("Credentials.json file not found and secrets not previous config.")
-                return None
+        get_backend().write_ids(sheet_name, ids)
+    except Exception:
+        # The rows stay without id (they can not be edited) until the next download tries again
+        return df
+    df = df.copy()
+    df.loc[blank, ID_COLUMN] = list(ids.values())
+    return df
 
-        url = "https://docs.google.com/spreadsheets/d/1ADvnbbl6a3AzkguJ_Qeua3PoV0n0hxJgxrvDITsCa7k/edit?gid=0#gid=0"
 
-        # Via my credentials, get my google sheets
-        gc = credentials.open_by_url(url)
+# Read-through cache of get_df: one entry per sheet with the dataframe and the time it was downloaded.
+# The writes below patch (or drop) only the entry of the sheet they touched.
+_df_cache = {}
+_cache_lock = threading.Lock()
 
-        # Get my database from specific sheet
-        worksheet = gc.worksheet_by_title(sheet_name)
+# Record id -> row (ID_Google) of the cached sheets: built once per cached dataframe and extended on append.
+_row_indexes = {}
 
-        return worksheet
-    
-    except Exception as e:
-        st.error(f"Erro de Conexão na aba {sheet_name}: {e}")
+# Seconds that a downloaded sheet is served from memory before get_df goes to the storage again.
+CACHE_TTL = float(setting("cache_ttl", 300))
+
+# Archived years of the records (see partitions.py) do not change, so they stay on the cache much longer.
+ARCHIVE_TTL = float(setting("archive_ttl", 24 * 3600))
+
+# Sheets that only grow at the bottom (save_record). When their cache expires, get_df downloads only the new rows.
+INCREMENTAL_SHEETS = {"database"}
+INCREMENTAL_SYNC = str(setting("incremental_sync", "true")).lower() in ("1", "true", "yes")
+
+# Seconds between two full downloads of an incremental sheet, to catch manual edits made in the middle of it.
+FULL_SYNC_EVERY = float(setting("full_sync_every", 3600))
+
+# Downloads of a sheet tried by _refresh while saves keep patching its cache entry
+REFRESH_ATTEMPTS = 3
+
+# Warm start: every downloaded sheet is also saved as an Arrow file. After a restart the file is served
+# at once and a background thread reconciles it with the storage. Only the first load of a sheet in the
+# process uses the file, the later ones (expired cache, clear_cache) go to the storage.
+SNAPSHOTS = str(setting("snapshots", "true")).lower() in ("1", "true", "yes") and snapshot.available()
+SNAPSHOT_DIR = setting("snapshot_dir", ".focusdata_snapshots")
+_refreshing = set()
+_warm_started = set()
+_snapshot_lock = threading.Lock()
+
+# Tables derived from the records (daily rollup...). They are built once from the cached records
+# and then follow the changes of the cache (_cache_changed), so the pages never rebuild them per rerun.
+_derived = {"version": 0}
+_derived_lock = threading.Lock()
+
+# Rollup and reading log of the archived years, kept apart: a change of the hot sheet does not rebuild them.
+# "sheets" has the aggregates of every archive and "hashes" their hash (see partitions.aggregates_hash),
+# "rollup" / "reading_log" the totals for the index "stamp".
+_archived = {}
+
+# Write-behind mode: saves go to a local journal and a background thread sends them to the storage.
+WRITE_BEHIND = str(setting("write_behind", "false")).lower() in ("1", "true", "yes")
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def _get_journal():
+    """
+    Return the write-behind journal of the process (created on first use).
+    """
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = WriteJournal(
+                setting("journal_path", "focusdata_journal.sqlite"),
+                get_backend,
+                on_flushed=_append_to_cache
+            )
+            # Send what a previous run left behind
+            _journal.start()
+        return _journal
+
+
+def write_status():
+    """
+    Sync status of the write-behind journal ({"pending", "flushed", "last_error"}), or None when it is off.
+    """
+    if not WRITE_BEHIND:
+        return None
+    return _get_journal().status()
+
+
+def get_pending(sheet_name="database"):
+    """
+    Typed dataframe of the rows still waiting on the journal (negative ID_Google), or None.
+    """
+    if not WRITE_BEHIND:
         return None
+    pending = _get_journal().pending_rows(sheet_name)
+    if not pending:
+        return None
+    columns = SHEET_COLUMNS[sheet_name]
+    pending_df = pd.DataFrame(_padded([row for _, row in pending], columns), columns=columns)
+    pending_df["ID_Google"] = [pending_id for pending_id, _ in pending]
+    return _normalize(sheet_name, pending_df)
+
+
+def _with_pending(sheet_name, df):
+    """
+    Add the rows still waiting on the journal at the end of the dataframe.
+    """
+    pending_df = get_pending(sheet_name)
+    if pending_df is None:
+        return df
+    return _concat(sheet_name, [df, pending_df])
+
+
+def clear_cache(sheet_name=None):
+    """
+    Forget the cached dataframe of one sheet, or of every sheet when sheet_name is None.
+    The snapshots go too, so the next read is a full download (also after a restart).
+    """
+    with _cache_lock:
+        if sheet_name is None:
+            _df_cache.clear()
+        else:
+            _df_cache.pop(sheet_name, None)
+        if SNAPSHOTS:
+            try:
+                snapshot.delete(SNAPSHOT_DIR, sheet_name)
+            except OSError:
+                pass
+
+    if sheet_name is None:
+        # The aggregates of the archives are read again too (one request)
+        with _derived_lock:
+            _archived.clear()
+    _cache_changed(sheet_name or "database")
+
+
+def _cache_changed(sheet_name, added=None, removed=None):
+    """
+    Keep the derived tables in line with the records cache.
+    added / removed: records that entered or left the cache. Without them, the cache was replaced
+    and the derived tables are dropped (rebuilt on next use).
+    """
+    if sheet_name != "database":
+        if base_sheet(sheet_name) != "database" and sheet_name != partitions.INDEX_SHEET:
+            return
+        if sheet_name != partitions.INDEX_SHEET:
+            # The aggregates of the archive follow its records (downloaded or edited)
+            _archive_changed(sheet_name)
+        # An archive (or the index) changed: the history tables are built again from the archive tables
+        added = removed = None
+
+    with _derived_lock:
+        # A table being built while the cache changes is thrown away (see get_daily_rollup)
+        version = _derived["version"] + 1
+
+        if added is None and removed is None:
+            _derived.clear()
+            _derived["version"] = version
+            return
+
+        _derived["version"] = version
+        if "rollup" in _derived:
+            _derived["rollup"] = rollup.apply_changes(_derived["rollup"], added, removed)
+        if "reading_log" in _derived:
+            # Only the books of the changed records are computed again
+            _derived["reading_log"], keys = reading.apply_changes(_derived["reading_log"], added, removed)
+            _derived["book_progress"] = reading.update_progress(_derived["book_progress"], _derived["reading_log"], keys)
+        # Streaks and the date index are cheap to build again, so they are only dropped
+        _derived.pop("streak_runs", None)
+        _derived.pop("date_index", None)
+
+
+def _patch_cache(sheet_name, patch):
+    """
+    Apply patch(df) to the cached dataframe of a sheet, keeping its download time, and write the
+    snapshot again. If the patch fails the entry (and the snapshot) is dropped, so the next read
+    downloads the sheet again.
+    Return True when the cached dataframe was patched.
+    """
+    with _cache_lock:
+        entry = _df_cache.get(sheet_name)
+        if entry is None:
+            return False
+        try:
+            entry["df"] = patch(entry["df"])
+            entry["version"] += 1
+            patched = True
+        except Exception:
+            _df_cache.pop(sheet_name, None)
+            patched = False
+
+    _save_snapshot(sheet_name)
+    if not patched:
+        _cache_changed(sheet_name)
+    return patched
+
+
+def _append_to_cache(sheet_name, rows, new_ids):
+    """
+    Add the rows that were just appended to the storage at the end of the cached dataframe.
+    """
+    if not new_ids or len(new_ids) != len(rows):
+        # Without the new ids the cache can not address the rows later, so download again
+        clear_cache(sheet_name)
+        return
+
+    added = []
+
+    def append(df):
+        columns = sheet_columns(sheet_name)
+        new_rows = pd.DataFrame(_padded(rows, columns), columns=columns)
+        new_rows["ID_Google"] = new_ids
+        new_rows = _normalize(sheet_name, new_rows)
+        if "ID_Google" in df.columns:
+            # A download may already have brought these rows
+            new_rows = new_rows[~new_rows["ID_Google"].isin(df["ID_Google"])]
+        added.append(new_rows)
+        appended = _concat(sheet_name, [df, new_rows])
+        _extend_row_index(sheet_name, df, appended, new_rows)
+        return appended
+
+    if _patch_cache(sheet_name, append):
+        _cache_changed(sheet_name, added=added[0])
+
+
+def _update_in_cache(sheet_name, updates):
+    """
+    Replace the values of the cached rows. updates: list of (row id, {column: value}).
+    """
+    changed = {}
+
+    def update(df):
+        df = df.copy()
+        ids = [row_id for row_id, _ in updates]
+        changed["removed"] = df[df["ID_Google"].isin(ids)].copy()
+        for row_id, cells in updates:
+            mask = df["ID_Google"] == row_id
+            if not mask.any():
+                raise KeyError(row_id)
+            _set_cells(sheet_name, df, mask, cells)
+        changed["added"] = df[df["ID_Google"].isin(ids)]
+        return df
+
+    if _patch_cache(sheet_name, update):
+        _cache_changed(sheet_name, added=changed["added"], removed=changed["removed"])
+
+
+def _extend_row_index(sheet_name, df, appended, new_rows):
+    """
+    Move the id -> row index of 'df' to 'appended' (df plus new_rows). Call it holding _cache_lock.
+    """
+    entry = _row_indexes.get(sheet_name)
+    if entry is None or entry["df"] is not df:
+        return
+    entry["rows"].update(zip(new_rows[ID_COLUMN], new_rows["ID_Google"].astype(int)))
+    entry["rows"].pop("", None)
+    entry["df"] = appended
+
+
+def _row_index(sheet_name):
+    """
+    {record id: row id} of the cached sheet.
+    """
+    df = _cached_df(sheet_name)
+    if df is None:
+        return {}
+    with _cache_lock:
+        entry = _row_indexes.get(sheet_name)
+        if entry is not None and entry["df"] is df:
+            return entry["rows"]
+
+    rows = dict(zip(df[ID_COLUMN], df["ID_Google"].astype(int)))
+    rows.pop("", None)
+    with _cache_lock:
+        _row_indexes[sheet_name] = {"df": df, "rows": rows}
+    return rows
+
+
+def _resolve_rows(sheet_name, record_ids):
+    """
+    Rows (ID_Google) of records by their id: {record id: row id}.
+    The index gives the rows at once, and one small read of their ID cells checks that they still hold
+    the records. Rows moved since the download (deleted or inserted rows above them) are found again
+    on the ID column only, never with a new download of the sheet.
+    Return (rows, moved): records not found anymore are left out, moved is True when cached rows are old.
+    """
+    index = _row_index(sheet_name)
+    rows = {record_id: index[record_id] for record_id in record_ids if record_id in index}
+    stored = get_backend().read_ids(sheet_name, list(rows.values())) if rows else {}
+    lost = [record_id for record_id in record_ids if stored.get(rows.get(record_id)) != record_id]
+    if not lost:
+        return rows, False
+
+    located = {record_id: row_id for row_id, record_id in get_backend().read_ids(sheet_name).items() if record_id}
+    for record_id in lost:
+        rows.pop(record_id, None)
+        if record_id in located:
+            rows[record_id] = located[record_id]
+    return rows, True
+
 
 def get_df(sheet_name="database"):
     '''
     Conection usage for data load and tranform into a dataframe.
+    The dataframe is served from the memory cache while it is younger than CACHE_TTL.
     '''
-    sheet = get_worksheet(sheet_name)
-    
-    if sheet:
-        # Transforms my records into a dataframe
-        df = sheet.get_as_df(has_header=True)
-
-        # If database is empty, create a visual database just to show what the model would look like.
-        if df.empty:
-            if sheet_name == "books_library_d":
-                return pd.DataFrame(columns=["Name_book", "Author", "Total_pages", "Status"])
-            elif sheet_name == "weekly_planner":
-                return pd.DataFrame(columns=["Day", "Activity", "Notes", "Time"])
+    with metrics.timed("get_df", sheet_name) as event:
+        df = _cached_df(sheet_name)
+        event["rows"] = 0 if df is None else len(df)
+    if df is None:
+        return None
+
+    # The pages change the dataframe in place, so each caller gets its own copy
+    return _with_pending(sheet_name, df.copy())
+
+
+def _ttl(sheet_name):
+    return ARCHIVE_TTL if base_sheet(sheet_name) != sheet_name else CACHE_TTL
+
+
+def _cached_df(sheet_name):
+    '''
+    Return the cached dataframe of the sheet (not a copy, do not change it), refreshing it when expired.
+    '''
+    with _cache_lock:
+        entry = _df_cache.get(sheet_name)
+        if entry is not None and time.time() - entry["loaded_at"] < _ttl(sheet_name):
+            metrics.count("cache_hit", sheet_name)
+            return entry["df"]
+
+    metrics.count("cache_miss", sheet_name)
+    if entry is None:
+        entry = _warm_start(sheet_name)
+        if entry is not None:
+            metrics.count("snapshot_hit", sheet_name)
+            return entry["df"]
+
+    return _refresh(sheet_name, entry)
+
+
+def _snapshot_stamp(sheet_name):
+    """
+    Version of the snapshot format: a snapshot saved by other columns, types or storage is not used.
+    """
+    base = base_sheet(sheet_name)
+    layout = json.dumps([SHEET_COLUMNS.get(base), SCHEMAS.get(base), get_backend().name])
+    return zlib.crc32(layout.encode())
+
+
+def _save_snapshot(sheet_name):
+    """
+    Write the cached dataframe of the sheet as its snapshot. Called after every download and every
+    patch of the cache, so a restart never serves values older than the last save of this process.
+    """
+    if not SNAPSHOTS:
+        return
+    # One writer at a time, and always the entry cached at the time of the write (never an older one)
+    with _snapshot_lock:
+        with _cache_lock:
+            entry = _df_cache.get(sheet_name)
+        try:
+            if entry is None:
+                snapshot.delete(SNAPSHOT_DIR, sheet_name)
+                return
+            stamp = {
+                "version": _snapshot_stamp(sheet_name),
+                "full_loaded_at": entry["full_loaded_at"],
+                "saved_at": time.time(),
+            }
+            snapshot.save(SNAPSHOT_DIR, sheet_name, entry["df"], stamp)
+        except Exception:
+            # The snapshot only speeds up the next start, a failure here must not break the page
+            pass
+
+
+def _warm_start(sheet_name):
+    """
+    Put the snapshot of the sheet on the cache and start a background refresh.
+    Return the new cache entry, or None when there is no valid snapshot.
+    """
+    with _cache_lock:
+        if not SNAPSHOTS or sheet_name in _warm_started:
+            return None
+        _warm_started.add(sheet_name)
+
+    loaded = snapshot.load(SNAPSHOT_DIR, sheet_name)
+    if loaded is None:
+        return None
+    df, stamp = loaded
+    if stamp.get("version") != _snapshot_stamp(sheet_name):
+        return None
+
+    df = _normalize(sheet_name, df)
+    entry = _cache_entry(df, float(stamp.get("full_loaded_at", 0)))
+    with _cache_lock:
+        if sheet_name in _df_cache:
+            return _df_cache[sheet_name]
+        _df_cache[sheet_name] = entry
+    _cache_changed(sheet_name)
+
+    _refresh_in_background(sheet_name, entry)
+    return entry
+
+
+def _refresh_in_background(sheet_name, entry):
+    """
+    Reconcile a cache entry with the storage without blocking the page.
+    """
+    with _cache_lock:
+        if sheet_name in _refreshing:
+            return
+        _refreshing.add(sheet_name)
+
+    def run():
+        try:
+            _refresh(sheet_name, entry)
+        finally:
+            with _cache_lock:
+                _refreshing.discard(sheet_name)
+
+    threading.Thread(target=run, name=f"focusdata-refresh-{sheet_name}", daemon=True).start()
+
+
+def _cache_entry(df, full_loaded_at):
+    """
+    New cache entry. version counts the patches (saves, edits) made on it since the download.
+    """
+    return {"df": df, "loaded_at": time.time(), "full_loaded_at": full_loaded_at, "version": 0}
+
+
+def _unchanged(sheet_name, entry, version):
+    """
+    Check, holding _cache_lock, that the cache still has this entry without new patches.
+    """
+    current = _df_cache.get(sheet_name)
+    return current is entry and (entry is None or entry["version"] == version)
+
+
+def _refresh(sheet_name, entry):
+    '''
+    Bring the sheet from the storage (only the new rows when possible), store it on the cache and return it.
+    A save or edit that patched the entry during the download would be lost by the swap, so then the
+    download starts again from the patched entry (REFRESH_ATTEMPTS times at most).
+    '''
+    for attempt in range(REFRESH_ATTEMPTS):
+        if attempt and entry is not None and time.time() - entry["loaded_at"] < _ttl(sheet_name):
+            # Another thread loaded the sheet meanwhile
+            return entry["df"]
+        version = None if entry is None else entry["version"]
+
+        new_rows = None
+        full_loaded_at = time.time()
+
+        if entry is not None and _can_sync_appended(sheet_name, entry):
+            new_rows = _sync_appended(sheet_name, entry["df"])
+            if new_rows is not None:
+                full_loaded_at = entry["full_loaded_at"]
+
+        if new_rows is None:
+            try:
+                df = _normalize(sheet_name, get_backend().read(sheet_name))
+            except Exception as e:
+                st.error(f"Erro de Conexão na aba {sheet_name}: {e}")
+                return None
+            df = _ensure_ids(sheet_name, df)
+        elif new_rows.empty:
+            df = entry["df"]
+        else:
+            df = _concat(sheet_name, [entry["df"], new_rows])
+
+        with _cache_lock:
+            swapped = _unchanged(sheet_name, entry, version)
+            if swapped:
+                _df_cache[sheet_name] = _cache_entry(df, full_loaded_at)
+                if new_rows is not None and not new_rows.empty:
+                    _extend_row_index(sheet_name, entry["df"], df, new_rows)
             else:
-                return pd.DataFrame(columns=["Date", "Time", "Category", "Notes", "Duration", "Pages"])
-        
-        df['ID_Google'] = df.index + 2
+                entry = _df_cache.get(sheet_name)
+        if swapped:
+            break
+        metrics.count("refresh_conflict", sheet_name)
+    else:
+        # The sheet kept changing: keep the patched entry, the next expiry downloads it again
+        return df if entry is None else entry["df"]
 
-        return df
-    return None
+    if new_rows is None:
+        _cache_changed(sheet_name)
+    elif not new_rows.empty:
+        _cache_changed(sheet_name, added=new_rows)
+
+    if new_rows is None or not new_rows.empty:
+        _save_snapshot(sheet_name)
+    return df
+
+
+def get_many(sheet_names, prefetch=()):
+    """
+    Load several sheets at once and return {sheet name: dataframe}.
+    Sheets still valid on the cache are not downloaded, the others come in one batched request.
+    prefetch: sheets loaded on the cache in the same request but not returned (nor copied), for the
+    tables of database.py the page reads next (records, partition index).
+    """
+    frames = {}
+    missing = []
+    returned = set(sheet_names)
+    sheet_names = list(sheet_names) + [sheet_name for sheet_name in prefetch if sheet_name not in returned]
+    # Entry (and its version) of every missing sheet, a sheet patched during the download is not replaced
+    seen = {}
+
+    # After a restart, the snapshots are served while the background refresh runs
+    for sheet_name in sheet_names:
+        with _cache_lock:
+            cold = sheet_name not in _df_cache
+        if cold:
+            _warm_start(sheet_name)
+
+    with _cache_lock:
+        for sheet_name in sheet_names:
+            entry = _df_cache.get(sheet_name)
+            if entry is not None and time.time() - entry["loaded_at"] < _ttl(sheet_name):
+                metrics.count("cache_hit", sheet_name)
+                frames[sheet_name] = entry["df"].copy() if sheet_name in returned else entry["df"]
+            elif entry is not None and _can_sync_appended(sheet_name, entry):
+                # Only the new rows are needed, get_df asks for them (and counts the miss)
+                frames[sheet_name] = None
+            else:
+                metrics.count("cache_miss", sheet_name)
+                missing.append(sheet_name)
+                seen[sheet_name] = (entry, None if entry is None else entry["version"])
+
+    if missing:
+        try:
+            loaded = get_backend().read_many(missing)
+        except Exception as e:
+            st.error(f"Erro de Conexão nas abas {', '.join(missing)}: {e}")
+            loaded = {}
+
+        loaded = {sheet_name: _ensure_ids(sheet_name, _normalize(sheet_name, df)) for sheet_name, df in loaded.items()}
+        now = time.time()
+        with _cache_lock:
+            for sheet_name in list(loaded):
+                if not _unchanged(sheet_name, *seen[sheet_name]):
+                    # get_df below serves the patched entry (or downloads it again)
+                    loaded.pop(sheet_name)
+                    continue
+                _df_cache[sheet_name] = _cache_entry(loaded[sheet_name], now)
+                frames[sheet_name] = loaded[sheet_name].copy() if sheet_name in returned else loaded[sheet_name]
+        for sheet_name in loaded:
+            _cache_changed(sheet_name)
+            _save_snapshot(sheet_name)
+
+    result = {}
+    for sheet_name in sheet_names:
+        if sheet_name not in returned:
+            continue
+        df = frames.get(sheet_name)
+        if df is None:
+            result[sheet_name] = get_df(sheet_name)
+        else:
+            result[sheet_name] = _with_pending(sheet_name, df)
+    return result
+
+
+def _can_sync_appended(sheet_name, entry):
+    """
+    Check if the expired cache entry can be refreshed with only the new rows.
+    """
+    if not INCREMENTAL_SYNC or sheet_name not in INCREMENTAL_SHEETS:
+        return False
+    if "ID_Google" not in entry["df"].columns or entry["df"].empty:
+        return False
+    return time.time() - entry["full_loaded_at"] < FULL_SYNC_EVERY
+
+
+def _sync_appended(sheet_name, cached):
+    """
+    Download only the rows appended after the cached ones.
+    Return the new rows, or None when the storage asks for a full download (edits, deletions or a new header).
+    """
+    columns = sheet_columns(sheet_name)
+    last = cached.iloc[[-1]]
+
+    try:
+        tail = get_backend().read_appended(sheet_name, int(last["ID_Google"].iloc[0]), columns)
+    except Exception:
+        # Any problem on the small request falls back to the full download
+        return None
+
+    if tail is None or tail.empty:
+        return None
+    tail = _normalize(sheet_name, tail)
+
+    # If the last known row changed, rows were edited or deleted above it
+    known = tail.iloc[[0]]
+    if known[columns].astype(str).values.tolist() != last[columns].astype(str).values.tolist():
+        return None
+
+    new_rows = tail.iloc[1:].reset_index(drop=True)
+    return _ensure_ids(sheet_name, new_rows, taken=cached[ID_COLUMN]) if ID_COLUMN in cached.columns else new_rows
+
+
+def get_partition_index():
+    """
+    Typed index of the archived years (Sheet, First_Date, Last_Date, Rows, Aggregates), empty before the first archive.
+    """
+    index = _cached_df(partitions.INDEX_SHEET)
+    return index if index is not None else _normalize(partitions.INDEX_SHEET, pd.DataFrame())
+
+
+def _history_records():
+    """
+    Cached records of the hot sheet. When the partition index also has to be downloaded, both come
+    in one batched request (the history tables read the index right after the records).
+    """
+    with _cache_lock:
+        stale = [
+            sheet_name for sheet_name in ("database", partitions.INDEX_SHEET)
+            if sheet_name not in _df_cache or time.time() - _df_cache[sheet_name]["loaded_at"] >= _ttl(sheet_name)
+        ]
+    if len(stale) > 1:
+        get_many([], prefetch=stale)
+    return _cached_df("database")
+
+
+def _archive_frames(date_from=None, date_to=None):
+    """
+    Cached typed records of the archives that cover the dates: {sheet name: dataframe}, oldest first.
+    """
+    sheet_names = partitions.covering(get_partition_index(), date_from, date_to)
+    with _cache_lock:
+        cold = [sheet_name for sheet_name in sheet_names if sheet_name not in _df_cache]
+    if len(cold) > 1:
+        # First use of several archives: one batched request instead of one per year
+        get_many(cold)
+
+    frames = {}
+    for sheet_name in sheet_names:
+        df = _cached_df(sheet_name)
+        if df is not None:
+            frames[sheet_name] = df
+    return frames
+
+
+def _stored_aggregates(hashes):
+    """
+    Load the saved aggregates of the archives that are not in memory with their hash of the index
+    ({sheet name: hash}), with one batched request. Aggregates that do not have the hash of the index
+    (saved by an edit that did not finish) are left out.
+    """
+    with _derived_lock:
+        known = _archived.get("hashes", {})
+        missing = [sheet_name for sheet_name, digest in hashes.items() if digest and known.get(sheet_name) != digest]
+    if missing:
+        names = [name for sheet_name in missing for name in partitions.aggregate_sheets(sheet_name)]
+        try:
+            loaded = get_backend().read_many(names)
+        except Exception:
+            # These archives are built from their records this time, the next call tries again
+            loaded = {}
+        sheets = {}
+        for sheet_name in missing:
+            daily_sheet, log_sheet = partitions.aggregate_sheets(sheet_name)
+            if daily_sheet in loaded and log_sheet in loaded:
+                tables = (
+                    _normalize(daily_sheet, loaded[daily_sheet])[rollup.ROLLUP_COLUMNS],
+                    _normalize(log_sheet, loaded[log_sheet])[reading.LOG_COLUMNS],
+                )
+                if partitions.aggregates_hash(tables) == hashes[sheet_name]:
+                    sheets[sheet_name] = tables
+        with _derived_lock:
+            for sheet_name, tables in sheets.items():
+                _archived.setdefault("sheets", {})[sheet_name] = tables
+                _archived.setdefault("hashes", {})[sheet_name] = hashes[sheet_name]
+
+
+def _aggregates_hashes():
+    """
+    Hash of the saved aggregates of every archive on the partition index: {sheet name: hash}.
+    """
+    index = get_partition_index()
+    return dict(zip(index["Sheet"], index["Aggregates"]))
+
+
+def _mark_aggregates(sheet_name, digest):
+    """
+    Write the hash of the saved aggregates of an archive on the partition index ("" = not saved).
+    """
+    index = get_partition_index()
+    row_ids = index.loc[index["Sheet"] == sheet_name, "ID_Google"]
+    if row_ids.empty:
+        return
+    updates = [(int(row_ids.iloc[0]), {"Aggregates": digest})]
+    get_backend().update_rows(partitions.INDEX_SHEET, updates)
+    _update_in_cache(partitions.INDEX_SHEET, updates)
+
+
+def _archive_changed(sheet_name, rewrite=False):
+    """
+    Build the aggregates of an archive from its cached records (after a download or an edit). When the
+    partition index does not have their hash (records edited, an archive run that stopped), they are
+    saved again and the index gets the new hash.
+    rewrite: save them also when the index has their hash, the saved ones are known to be different.
+    """
+    with _cache_lock:
+        entry = _df_cache.get(sheet_name)
+    if entry is None:
+        return
+    tables = partitions.aggregates(entry["df"])
+    digest = partitions.aggregates_hash(tables)
+    with _derived_lock:
+        if _archived.get("hashes", {}).get(sheet_name) != digest:
+            _archived.setdefault("sheets", {})[sheet_name] = tables
+            _archived.setdefault("hashes", {})[sheet_name] = digest
+            _archived.pop("stamp", None)
+
+    saved = _aggregates_hashes().get(sheet_name)
+    if saved is None or (saved == digest and not rewrite):
+        return
+    try:
+        if saved and saved != digest:
+            # The old hash goes first: if the save stops halfway, no process trusts the saved aggregates
+            _mark_aggregates(sheet_name, "")
+        partitions.save_aggregates(get_backend(), sheet_name, tables)
+        if saved != digest:
+            _mark_aggregates(sheet_name, digest)
+    except Exception:
+        # The index has no hash for the archive, so the next load (this process or another) builds
+        # its aggregates from the records again and tries the save once more
+        pass
+
+
+def _archive_tables():
+    """
+    Rollup and reading log of every archived year. The tables of the full history are these plus the
+    records of the hot sheet.
+    Closed years do not change, so their aggregates come from the aggregate sheets and stay in memory
+    while the partition index is the same. An archive is only downloaded when the index has no hash for
+    its aggregates, or not the hash of the saved ones (an edit whose save failed, a save in progress).
+    """
+    index = get_partition_index()
+    sheet_names = partitions.covering(index)
+    stamp = tuple(map(tuple, index.reindex(columns=partitions.INDEX_COLUMNS).astype(str).values.tolist()))
+    with _derived_lock:
+        if _archived.get("stamp") == stamp:
+            return _archived
+
+    hashes = _aggregates_hashes()
+    _stored_aggregates({sheet_name: hashes[sheet_name] for sheet_name in sheet_names})
+    with _derived_lock:
+        known = _archived.get("hashes", {})
+        stale = [sheet_name for sheet_name in sheet_names if known.get(sheet_name) != hashes[sheet_name]]
+    # Archives whose aggregates in memory are the ones of their records
+    fresh = set(sheet_names) - set(stale)
+    if stale:
+        with _cache_lock:
+            cached = {sheet_name for sheet_name in stale if sheet_name in _df_cache}
+        if len(stale) > 1:
+            get_many([], prefetch=stale)
+        for sheet_name in stale:
+            # A download already built them (see _cache_changed), a cached archive is built here
+            if _cached_df(sheet_name) is not None:
+                # With a hash on the index, the saved aggregates did not match it (lost, or a save in progress)
+                _archive_changed(sheet_name, rewrite=bool(hashes[sheet_name]))
+                fresh.add(sheet_name)
+        # The records were only needed for the aggregates
+        with _cache_lock:
+            for sheet_name in set(stale) - cached:
+                _df_cache.pop(sheet_name, None)
+
+    with _derived_lock:
+        sheets = _archived.get("sheets", {})
+        parts = [sheets[sheet_name] for sheet_name in sheet_names if sheet_name in fresh and sheet_name in sheets]
+        daily = [part[0] for part in parts if not part[0].empty]
+        logs = [part[1] for part in parts if not part[1].empty]
+        _archived["rollup"] = pd.concat(daily, ignore_index=True) if daily else rollup.build_rollup(None)
+        _archived["reading_log"] = pd.concat(logs, ignore_index=True) if logs else reading.build_log(None)
+        # An archive that could not be read is tried again on the next call
+        if len(parts) == len(sheet_names):
+            _archived["stamp"] = stamp
+        return _archived
+
+
+def get_records(date_from=None, date_to=None, categories=None, columns=None):
+    """
+    Typed records with date_from <= Date <= date_to (None = no limit) of every partition, oldest first
+    (see query). Only the archives that cover the dates are read, besides the hot sheet, so a query of
+    the current month reads the hot sheet only.
+    Each partition keeps its own ID_Google: the result is for reading, edits go through the record ID.
+    """
+    sheet_names = list(_archive_frames(date_from, date_to)) + ["database"]
+    frames = [query(sheet_name, date_from, date_to, categories, columns) for sheet_name in sheet_names]
+    frames = [df for df in frames if df is not None]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_daily_rollup():
+    """
+    Daily rollup of the records: one row per (Date, Category) with minutes, pages and sessions.
+    Built once from the records and then updated by every save / update (see rollup.py).
+    The archived years come from their own rollup, built once per version of the archives.
+    Rows still waiting on the write-behind journal are counted after they are flushed.
+    """
+    records = _history_records()
+    if records is None:
+        return pd.DataFrame(columns=rollup.ROLLUP_COLUMNS)
+    # Loading an archive changes the version, so the archives come first
+    archived = _archive_tables()
+
+    with _derived_lock:
+        if "rollup" in _derived:
+            return _derived["rollup"]
+        version = _derived["version"]
+
+    # Built outside the lock, the cache lock is taken by the reads
+    daily = rollup.apply_changes(archived["rollup"], added=records)
+
+    with _derived_lock:
+        if _derived["version"] == version and "rollup" not in _derived:
+            _derived["rollup"] = daily
+        return _derived.get("rollup", daily)
+
+
+def get_streak_runs():
+    """
+    Every streak of every category over the full history (see streaks.py), cached until the records change.
+    """
+    daily = get_daily_rollup()
+
+    with _derived_lock:
+        if "streak_runs" in _derived:
+            return _derived["streak_runs"]
+        version = _derived["version"]
+
+    runs = streaks.streak_runs(daily)
+
+    with _derived_lock:
+        if _derived["version"] == version:
+            _derived["streak_runs"] = runs
+    return runs
+
+
+def get_book_progress():
+    """
+    Reading progress per book key (pages read, last activity), see reading.py.
+    Built once from the records (and the archived years) and then updated by every save / update of a record.
+    """
+    records = _history_records()
+    if records is None:
+        return reading.build_progress(pd.DataFrame(columns=reading.LOG_COLUMNS))
+    archived = _archive_tables()
+
+    with _derived_lock:
+        if "book_progress" in _derived:
+            return _derived["book_progress"]
+        version = _derived["version"]
+
+    log, _ = reading.apply_changes(archived["reading_log"], added=records)
+    progress = reading.build_progress(log)
+
+    with _derived_lock:
+        if _derived["version"] == version and "book_progress" not in _derived:
+            _derived["reading_log"] = log
+            _derived["book_progress"] = progress
+        return _derived.get("book_progress", progress)
+
+
+def get_date_index(sheet_name="database"):
+    """
+    Date-sorted index of the cached records of one partition (see paging.py), used by the paged tables.
+    Built once per version of the records, so a rerun does not sort the history again.
+    """
+    records = _cached_df(sheet_name)
+    if records is None:
+        return None
+
+    with _derived_lock:
+        index = _derived.get("date_index", {}).get(sheet_name)
+        if index is not None and index["records"] is records:
+            return index
+        version = _derived["version"]
+
+    index = paging.build_date_index(records)
+
+    with _derived_lock:
+        if _derived["version"] == version:
+            _derived.setdefault("date_index", {})[sheet_name] = index
+    return index
+
+
+def query(sheet_name="database", date_from=None, date_to=None, categories=None, columns=None):
+    """
+    Cached records of one partition with date_from <= Date <= date_to (None = no limit) and one of the
+    categories (None = all), oldest first, with only the given columns (None = all).
+    The rows are found on the date index (binary search on the dates, then the category codes), and
+    only the selected rows and columns are copied, never the full sheet.
+    Rows without a date and rows still on the write-behind journal are not on the index.
+    """
+    with metrics.timed("query", sheet_name) as event:
+        index = get_date_index(sheet_name)
+        if index is None:
+            return None
+        records = index["records"]
+        rows = paging.select(index, date_from, date_to, categories)
+        if columns is None:
+            df = records.iloc[rows]
+        else:
+            unknown = [column for column in columns if column not in records.columns]
+            if unknown:
+                raise KeyError(f"unknown column(s) {unknown}")
+            df = records.iloc[rows, records.columns.get_indexer(columns)]
+        df = df.reset_index(drop=True)
+        event["rows"] = len(df)
+    return df
+
+
+def _append(sheet_name, row):
+    """
+    Add a new row to the storage and to the cache.
+    In write-behind mode the row goes to the local journal and the call returns at once.
+    """
+    if WRITE_BEHIND:
+        _get_journal().add(sheet_name, row)
+        return True
+
+    try:
+        new_ids = get_backend().append_rows(sheet_name, [row])
+    except Exception as e:
+        st.error(f"Erro de Conexão na aba {sheet_name}: {e}")
+        return False
+
+    _append_to_cache(sheet_name, [row], new_ids)
+    return True
+
+
+def _update(sheet_name, updates):
+    """
+    Send the changed cells to the storage and patch the cache. updates: list of (record id, {column: value}).
+    Return the ids of the records that are not on the storage anymore (nothing is written for them).
+    """
+    rows, moved = _resolve_rows(sheet_name, [record_id for record_id, _ in updates])
+    found = [(rows[record_id], cells) for record_id, cells in updates if record_id in rows]
+    if found and base_sheet(sheet_name) != sheet_name and _aggregates_hashes().get(sheet_name):
+        # The saved aggregates of the archive stop being trusted before its records change: if their
+        # save fails (or the process stops first), the next load builds them from the records
+        _mark_aggregates(sheet_name, "")
+    if found:
+        get_backend().update_rows(sheet_name, found)
+
+    if moved:
+        # The cached rows are not where the cache thinks, the next read downloads the sheet again
+        clear_cache(sheet_name)
+        if found and base_sheet(sheet_name) != sheet_name:
+            # The aggregates of an archive are built from its records: download it now
+            _cached_df(sheet_name)
+    elif found:
+        _update_in_cache(sheet_name, found)
+    return [record_id for record_id, _ in updates if record_id not in rows]
 
 
 def save_record(date, time, category, notes, duration, pages=0):
     """
     Receive data and add a new row to the Google Sheets.
     """
-    sheet = get_worksheet("database")
+    # Convert date to string (YYYY-MM-DD) for google sheets understand
+    row = [str(date), str(time), str(category), str(notes), int(duration), int(pages), new_id()]
 
-    if sheet:
-        # Convert date to string (YYYY-MM-DD) for google sheets understand
-        row = [str(date), str(time), str(category), str(notes), int(duration), int(pages)]
-        
-        # The function gets the list of [row], and inserts it without overwriting. This means it will paste into the next blank row.
-        sheet.append_table([row], start='A2', dimension='ROWS', overwrite=False)
-        return True
-    return False
+    return _append("database", row)
 
 def save_book(Name_book, Author, Total_pages, Status):
     """
     Receive data and add a new row to the Google Sheets.
     """
-    sheet = get_worksheet("books_library_d")
+    # Convert date to string (YYYY-MM-DD) for google sheets understand
+    row = [str(Name_book), str(Author), str(Total_pages), str(Status), new_id()]
 
-    if sheet:
-        # Convert date to string (YYYY-MM-DD) for google sheets understand
-        row = [str(Name_book), str(Author), str(Total_pages), str(Status)]
-        
-        # The function gets the list of [row], and inserts it without overwriting. This means it will paste into the next blank row.
-        sheet.append_table([row], start='A2', dimension='ROWS', overwrite=False)
-        return True
-    return False
+    return _append("books_library_d", row)
 
-def update_record(real_row_id,date, time, category, notes, duration, pages=0):
+def update_record(record_id,date, time, category, notes, duration, pages=0):
     """
-    Update a record based on the pandas index
+    Update a record based on its id (ID column)
     """
-    sheet = get_worksheet("database")
+    try:
+        # Prepare rows and your type of data (Exactly sequence)
+        row_data = [
+            str(date),
+            str(time),
+            str(category),
+            str(notes),
+            int(duration),
+            int(pages)
+        ]
 
-    if sheet:
-        try:
-            # Calculate real row of excel
-            # (Pandas starts in 0, Excel starts in 1 + 1 from header = +2)
-            google_row_number = real_row_id
-            
-            # Prepare rows and your type of data (Exactly sequence)
-            row_data = [
-                str(date), 
-                str(time), 
-                str(category), 
-                str(notes), 
-                int(duration),
-                int(pages)
-            ]
-            
-            # Define the exact address (Range)
-            # Ex: If the line is 10, the range will be "A10:D10"
-            range_address = f"A{google_row_number}:F{google_row_number}"
-            
-            st.toast(f"💾 Changing row {google_row_number}")
-            # Send the update command via range
-            sheet.update_values(crange=range_address, values=[row_data])
-            
-            return True
-            
-        except Exception as e:
-            st.error(f"Error to update {range_address}: {e}")
+        st.toast(f"💾 Changing record {record_id}")
+        if _update("database", [(record_id, dict(zip(RECORD_COLUMNS, row_data)))]):
+            st.error(f"Record {record_id} was not found, it may have been deleted")
             return False
-                
-    return False
+        return True
 
-def update_book(real_row_id,Name_book, Author, Total_pages, Status):
+    except Exception as e:
+        st.error(f"Error to update record {record_id}: {e}")
+        return False
+
+
+def _record_cell(column, value):
     """
-    Update a record based on the pandas index
+    Convert one edited value to the type that the records sheet stores in that column.
     """
-    sheet = get_worksheet("books_library_d")
+    if column == "Date":
+        # Garante formato de string YYYY-MM-DD
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    if column in ("Duration", "Pages"):
+        if value is None or pd.isna(value) or value == "":
+            return 0
+        return int(float(value))
+    if value is None or pd.isna(value):
+        return ""
+    return str(value)
+
 
-    if sheet:
+def update_records(batch, sheet_name="database"):
+    """
+    Update many records with one batched request.
+    batch: list of (record id, {column: new value}) with only the changed fields.
+    sheet_name: the hot sheet or an archived year ("database_2023").
+    Only the changed cells are written. Return a dict {record id: error message} with the records
+    that could not be saved (empty dict = everything saved).
+    """
+    errors = {}
+    updates = []
+    pending = get_pending(sheet_name)
+    pending_ids = set(pending[ID_COLUMN]) if pending is not None else set()
+
+    for record_id, changes in batch:
         try:
-            # Calculate real row of excel
-            # (Pandas starts in 0, Excel starts in 1 + 1 from header = +2)
-            google_row_number = real_row_id
-            
-            # Prepare rows and your type of data (Exactly sequence)
-            row_data = [
-                str(Name_book), 
-                str(Author), 
-                str(Total_pages), 
-                str(Status)
-            ]
-            
-            # Define the exact address (Range)
-            # Ex: If the line is 10, the range will be "A10:D10"
-            range_address = f"A{google_row_number}:F{google_row_number}"
-            
-            st.toast(f"💾 Changing row {google_row_number}")
-            # Send the update command via range
-            sheet.update_values(crange=range_address, values=[row_data])
-            
-            return True
-            
+            if record_id in pending_ids:
+                raise ValueError("record is still waiting to be sent to the storage")
+            if not record_id:
+                raise ValueError("record without id, refresh the page")
+
+            cells = {}
+            for column, value in changes.items():
+                if column not in RECORD_COLUMNS or column == ID_COLUMN:
+                    raise ValueError(f"unknown column '{column}'")
+                cells[column] = _record_cell(column, value)
+
         except Exception as e:
-            st.error(f"Error to update {range_address}: {e}")
+            errors[record_id] = str(e)
+            continue
+
+        if cells:
+            updates.append((record_id, cells))
+
+    if not updates:
+        return errors
+
+    try:
+        st.toast(f"💾 Changing {len(updates)} row(s)")
+        for record_id in _update(sheet_name, updates):
+            errors[record_id] = "record not found, it may have been deleted"
+    except Exception as e:
+        st.error(f"Error to update records: {e}")
+        # The batch is one request, so every row of it failed
+        for record_id, _ in updates:
+            errors[record_id] = "batch update failed"
+
+    return errors
+
+def update_book(record_id,Name_book, Author, Total_pages, Status):
+    """
+    Update a book based on its id (ID column)
+    """
+    try:
+        # Prepare rows and your type of data (Exactly sequence)
+        row_data = [
+            str(Name_book),
+            str(Author),
+            str(Total_pages),
+            str(Status)
+        ]
+
+        st.toast(f"💾 Changing book {record_id}")
+        if _update("books_library_d", [(record_id, dict(zip(SHEET_COLUMNS["books_library_d"], row_data)))]):
+            st.error(f"Book {record_id} was not found, it may have been deleted")
             return False
-                
-    return False
+        return True
+
+    except Exception as e:
+        st.error(f"Error to update book {record_id}: {e}")
+        return False
+
+def _plain(value):
+    """
+    Python value of a dataframe cell (numpy numbers are not JSON / API friendly).
+    """
+    return value.item() if hasattr(value, "item") else value
+
+
+def _planner_diff(cached, edited):
+    """
+    Compare the edited planner with the cached one.
+    Return (updates, inserts, deletes): changed cells of the kept rows, new rows, ids of removed rows.
+    """
+    columns = SHEET_COLUMNS["weekly_planner"]
+    edited = edited.reset_index(drop=True)
+    ids = pd.to_numeric(edited.get("ID_Google", pd.Series(index=edited.index, dtype=float)), errors="coerce")
+    typed = _normalize("weekly_planner", edited.reindex(columns=columns))
+    old_rows = cached.set_index("ID_Google")[columns]
+
+    kept_ids = set(ids.dropna().astype(int))
+    unknown = kept_ids - set(old_rows.index)
+    if unknown:
+        raise ValueError("the planner changed on the storage, refresh the page and edit again")
+
+    updates = []
+    inserts = []
+    for position, row_id in ids.items():
+        new = typed.iloc[position]
+        if pd.isna(row_id):
+            # Empty lines of the editor are not saved
+            if any(value not in ("", 0) for value in new):
+                inserts.append([_plain(new[column]) for column in columns])
+            continue
+        old = old_rows.loc[int(row_id)]
+        cells = {column: _plain(new[column]) for column in columns if str(new[column]) != str(old[column])}
+        if cells:
+            updates.append((int(row_id), cells))
+
+    deletes = sorted(set(old_rows.index) - kept_ids)
+    return updates, inserts, [int(row_id) for row_id in deletes]
+
 
 def save_planner(df):
     """
-    Clean the sheet and overwrite with a new planner
+    Save the edited planner: only the inserted, changed and deleted rows are sent, in one request.
+    Return the report {"inserted", "changed", "deleted"} (numbers of rows), or False on error.
     """
     try:
-        planner = get_worksheet("weekly_planner")
-
-        planner.clear()
+        cached = _cached_df("weekly_planner")
+        if cached is None:
+            return False
 
-        df_clean = df.fillna("")
+        updates, inserts, deletes = _planner_diff(cached, df)
+        report = {"inserted": len(inserts), "changed": len(updates), "deleted": len(deletes)}
 
-        planner.set_dataframe(df_clean, (1,1))
+        if updates or inserts or deletes:
+            get_backend().apply_diff("weekly_planner", updates, inserts, deletes)
+            # A delete moves the rows below it, so the next read downloads the planner again
+            clear_cache("weekly_planner")
+        return report
 
     except Exception as e:
         st.error(f"Erro ao salvar Planner: {e}")
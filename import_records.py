@@ -0,0 +1,263 @@
+"""
+Bulk import of activity records from CSV or JSON exports of other trackers.
+
+    python import_records.py history.csv
+    python import_records.py export.json --chunk-size 2000 --dry-run
+    python import_records.py diary.csv --date-format %d/%m/%Y
+
+The rows are checked and normalized to the records columns (Date, Time, Category, Notes,
+Duration, Pages) with a new ID (or the ID of the export, if it has one), rows already on the storage (or repeated in the file) are skipped, and the
+rest is appended in chunks of one request each. Records of closed years are then moved to their
+archive sheets (see partitions.py), like a run of partitions.py would do. The storage is the one
+chosen by the settings (FOCUSDATA_STORAGE_BACKEND, credentials.json...).
+
+If the import stops (network, quota), run the same command again: it continues after the last
+chunk saved (checkpoint file <input>.import.json) and the duplicate check skips any row that
+reached the storage anyway.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from config import CATEGORIES
+from partitions import archive_closed_years, read_history
+from storage import ID_COLUMN, SHEET_COLUMNS, get_backend, new_id
+
+RECORD_COLUMNS = SHEET_COLUMNS["database"]
+# Columns that say if two records are the same, the ID does not
+CONTENT_COLUMNS = [column for column in RECORD_COLUMNS if column != ID_COLUMN]
+
+# Other names of the columns found on exports (lower case)
+COLUMN_ALIASES = {
+    "date": "Date", "day": "Date",
+    "time": "Time", "hour": "Time", "start": "Time",
+    "category": "Category", "activity": "Category", "type": "Category",
+    "notes": "Notes", "note": "Notes", "description": "Notes", "detail": "Notes",
+    "duration": "Duration", "minutes": "Duration", "duration_min": "Duration",
+    "pages": "Pages",
+    "id": "ID",
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Dates are read with one format (the one the app saves, unless --date-format says otherwise):
+# a guess per value would read 03/04 as March or April depending on the other rows
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+
+def load(path):
+    """
+    Read a CSV file, or a JSON file with a list of objects (or {"records": [...]}), as text columns.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            data = data.get("records", [])
+        df = pd.DataFrame(data)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+
+    # Known names in any case become the sheet columns
+    renamed = {}
+    for column in df.columns:
+        target = COLUMN_ALIASES.get(str(column).strip().lower())
+        if target is not None and target not in renamed.values():
+            renamed[column] = target
+    return df.rename(columns=renamed)
+
+
+def normalize(df, date_format=DATE_FORMAT):
+    """
+    Convert the rows to the format the app saves (YYYY-MM-DD, HH:MM:SS, known category, int minutes).
+    Dates must match date_format, times HH:MM:SS or HH:MM.
+    Return (valid rows with RECORD_COLUMNS, rejected rows with a 'reason' column).
+    """
+    missing = [column for column in ("Date", "Category", "Duration") if column not in df.columns]
+    if missing:
+        raise ValueError(f"missing column(s) {missing}, found {list(df.columns)}")
+
+    def text(column):
+        if column not in df.columns:
+            return pd.Series("", index=df.index)
+        return df[column].astype(object).where(df[column].notna(), "").astype(str).str.strip()
+
+    clean = pd.DataFrame(index=df.index)
+    reason = pd.Series("", index=df.index)
+
+    dates = pd.to_datetime(text("Date"), errors="coerce", format=date_format)
+    clean["Date"] = dates.dt.strftime("%Y-%m-%d")
+    reason = reason.mask(dates.isna() & (reason == ""), f"invalid date (expected {date_format})")
+
+    raw_time = text("Time").replace("", "00:00:00")
+    times = pd.to_datetime(raw_time, errors="coerce", format=TIME_FORMATS[0])
+    for time_format in TIME_FORMATS[1:]:
+        times = times.fillna(pd.to_datetime(raw_time, errors="coerce", format=time_format))
+    clean["Time"] = times.dt.strftime("%H:%M:%S")
+    reason = reason.mask(times.isna() & (reason == ""), "invalid time")
+
+    # Categories are matched without case, and saved with the name of config.CATEGORIES
+    known = {category.casefold(): category for category in CATEGORIES}
+    clean["Category"] = text("Category").str.casefold().map(known)
+    reason = reason.mask(clean["Category"].isna() & (reason == ""), "unknown category")
+
+    clean["Notes"] = text("Notes")
+
+    duration = pd.to_numeric(text("Duration"), errors="coerce")
+    clean["Duration"] = duration.fillna(0).round().astype("int64")
+    reason = reason.mask(~(duration > 0) & (reason == ""), "invalid duration")
+
+    pages = pd.to_numeric(text("Pages").replace("", "0"), errors="coerce")
+    clean["Pages"] = pages.fillna(0).round().astype("int64")
+    reason = reason.mask(~(pages >= 0) & (reason == ""), "invalid pages")
+
+    ids = text(ID_COLUMN)
+    # An id that looks like a number would not survive the sheet, the row gets a new one
+    keep = (ids != "") & pd.to_numeric(ids.where(ids != ""), errors="coerce").isna()
+    clean[ID_COLUMN] = ids.where(keep, [new_id() for _ in range(len(ids))])
+
+    valid = reason == ""
+    rejected = df[~valid].copy()
+    rejected["reason"] = reason[~valid]
+    return clean.loc[valid, RECORD_COLUMNS].reset_index(drop=True), rejected
+
+
+def row_hashes(rows):
+    """
+    One hash per normalized row (without the ID), used to find duplicates.
+    """
+    return pd.util.hash_pandas_object(rows[CONTENT_COLUMNS].astype(str), index=False)
+
+
+def existing_hashes(backend):
+    """
+    Hashes of the records already on the storage (hot sheet and archived years), normalized the
+    same way as the imported ones (their dates are always in the format the app saves).
+    """
+    stored = read_history(backend)
+    if stored.empty:
+        return set()
+    rows, _ = normalize(stored.drop(columns=["ID_Google"], errors="ignore"))
+    return set(row_hashes(rows))
+
+
+def plan(rows, known):
+    """
+    Rows to send: without the ones already stored and without repeats inside the file.
+    The index keeps the position of every row on the file, the checkpoint counts on it.
+    """
+    hashes = row_hashes(rows)
+    keep = ~hashes.isin(known) & ~hashes.duplicated()
+    return rows[keep.to_numpy()]
+
+
+def _fingerprint(rows):
+    # Taken on the valid rows of the file, before the duplicate check (which changes as soon as rows are saved).
+    # New IDs change on every run, the checkpoint only looks at the content
+    return hashlib.sha256(pd.util.hash_pandas_object(rows[CONTENT_COLUMNS], index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _read_checkpoint(path, fingerprint):
+    """
+    Position on the file after the last row saved by a previous run (0 without checkpoint).
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path) as file:
+        state = json.load(file)
+    # A checkpoint of other rows (file changed) is ignored
+    return state.get("position", 0) if state.get("fingerprint") == fingerprint else 0
+
+
+def _write_checkpoint(path, fingerprint, position, total):
+    with open(path, "w") as file:
+        json.dump({"fingerprint": fingerprint, "position": position, "total": total, "updated_at": time.time()}, file)
+
+
+def run_import(path, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, keep_duplicates=False, date_format=DATE_FORMAT,
+               out=sys.stdout):
+    """
+    Import the file. Return {"read", "rejected", "duplicates", "appended", "archived"}.
+    """
+    started = time.perf_counter()
+    source = load(path)
+    rows, rejected = normalize(source, date_format)
+    print(f"{len(source)} row(s) read, {len(rows)} valid, {len(rejected)} rejected", file=out)
+
+    if len(rejected):
+        rejected_path = path + ".rejected.csv"
+        rejected.to_csv(rejected_path, index=False)
+        for reason, count in rejected["reason"].value_counts().items():
+            print(f"  {count} row(s): {reason}", file=out)
+        print(f"Rejected rows and reasons saved on {rejected_path}", file=out)
+
+    backend = get_backend()
+    known = set() if keep_duplicates else existing_hashes(backend)
+    to_send = plan(rows, known) if not keep_duplicates else rows
+    duplicates = len(rows) - len(to_send)
+    print(f"{duplicates} duplicate(s) skipped, {len(to_send)} row(s) to append", file=out)
+
+    report = {"read": len(source), "rejected": len(rejected), "duplicates": duplicates, "appended": 0, "archived": 0}
+    if dry_run:
+        return report
+
+    checkpoint = path + ".import.json"
+    fingerprint = _fingerprint(rows)
+    start = _read_checkpoint(checkpoint, fingerprint)
+    if start:
+        to_send = to_send[to_send.index >= start]
+        print(f"Resuming after row {start} of the file, saved by a previous run", file=out)
+
+    total = len(to_send)
+    positions = to_send.index.to_numpy()
+    values = to_send.astype(object).values.tolist()
+    chunks = -(-total // chunk_size)
+    for number, offset in enumerate(range(0, total, chunk_size), 1):
+        chunk = values[offset:offset + chunk_size]
+        backend.append_rows("database", chunk)
+        appended = offset + len(chunk)
+        # The next run continues after the last row of the file in this chunk
+        _write_checkpoint(checkpoint, fingerprint, int(positions[appended - 1]) + 1, len(rows))
+        report["appended"] = appended
+        elapsed = time.perf_counter() - started
+        print(f"[{number:>{len(str(chunks))}}/{chunks}] {appended}/{total} rows ({elapsed:.1f}s)", file=out)
+
+    # Done: the next import of the same file starts from zero (and finds everything as duplicate)
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    # Imported history is mostly of closed years: it goes to the archives, the hot sheet keeps the current
+    # year only. Also done when nothing was sent, so a run stopped before this step finishes it.
+    report["archived"] = sum(archive_closed_years(backend, out=out).values())
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import activity records from a CSV or JSON export.")
+    parser.add_argument("path", help="CSV or JSON file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per append request")
+    parser.add_argument("--dry-run", action="store_true", help="only check the file and count the rows")
+    parser.add_argument("--keep-duplicates", action="store_true", help="do not skip rows already stored")
+    parser.add_argument("--date-format", default=DATE_FORMAT,
+                        help="format of the Date column, e.g. %%d/%%m/%%Y (default %%Y-%%m-%%d); other rows are rejected")
+    args = parser.parse_args(argv)
+
+    try:
+        report = run_import(args.path, args.chunk_size, args.dry_run, args.keep_duplicates, args.date_format)
+    except Exception as e:
+        print(f"Import stopped: {e}", file=sys.stderr)
+        print("Run the same command again to continue from the last saved chunk.", file=sys.stderr)
+        return 1
+
+    print(json.dumps(report), file=sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import setting
+
+# Events kept in memory per operation (the percentiles use only these ones)
+WINDOW = 500
+
+# Structured log: one JSON line per event. The file is optional, ex: metrics_log = "focusdata_metrics.log"
+logger = logging.getLogger("focusdata.metrics")
+_log_path = setting("metrics_log", "")
+if _log_path and not logger.handlers:
+    _handler = logging.FileHandler(_log_path)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# Process-wide store: {operation: deque of events} and {(counter, sheet): value}
+_events = {}
+_counters = {}
+_lock = threading.Lock()
+
+# Event of the operation running on this thread, so a retry deep in the backend is counted on it
+_current = threading.local()
+
+# Rows measured to estimate the size of a frame: a deep measure of every text cell is too slow for big reads
+SIZE_SAMPLE_ROWS = 1000
+
+# While the admin panel is on the screen (and some seconds after) the sizes are measured exactly
+EXACT_SIZES_FOR = 60
+_exact_sizes_until = 0.0
+
+
+def _store(event):
+    with _lock:
+        _events.setdefault(event["operation"], deque(maxlen=WINDOW)).append(event)
+    logger.info(json.dumps(event, default=str))
+
+
+@contextmanager
+def timed(operation, sheet_name=None):
+    """
+    Measure the block and save one event. The block can fill event["rows"] and event["bytes"].
+    An exception is saved on the event and raised again.
+    """
+    event = {"time": time.time(), "operation": operation, "sheet": sheet_name,
+             "rows": 0, "bytes": 0, "retries": 0, "error": None}
+    parent = getattr(_current, "event", None)
+    _current.event = event
+    start = time.perf_counter()
+    try:
+        yield event
+    except Exception as e:
+        event["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        event["seconds"] = time.perf_counter() - start
+        _current.event = parent
+        _store(event)
+
+
+def retry(reason="auth"):
+    """
+    Count a retry on the operation running on this thread.
+    """
+    event = getattr(_current, "event", None)
+    if event is not None:
+        event["retries"] += 1
+    count(f"retry_{reason}", event["sheet"] if event else None)
+
+
+def count(counter, sheet_name=None, value=1):
+    """
+    Add to a counter (ex: cache_hit, cache_miss) of the sheet.
+    """
+    with _lock:
+        key = (counter, sheet_name)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def frame_bytes(df):
+    """
+    Memory of a downloaded dataframe, used as the size of a read.
+    Estimated from the first SIZE_SAMPLE_ROWS rows (average row size x rows), exact while the
+    admin metrics panel is open.
+    """
+    if df is None or df.empty:
+        return 0
+    if len(df) <= SIZE_SAMPLE_ROWS or time.time() < _exact_sizes_until:
+        return int(df.memory_usage(index=False, deep=True).sum())
+    sample = df.iloc[:SIZE_SAMPLE_ROWS].memory_usage(index=False, deep=True).sum()
+    return int(sample / SIZE_SAMPLE_ROWS * len(df))
+
+
+def rows_bytes(rows):
+    """
+    Size of the rows sent on a write (as JSON, close to the request body).
+    """
+    return len(json.dumps(rows, default=str))
+
+
+def summary():
+    """
+    One row per operation: calls, errors, retries, latency percentiles (ms), rows and bytes moved.
+    """
+    with _lock:
+        events = {operation: list(items) for operation, items in _events.items()}
+
+    rows = []
+    for operation, items in sorted(events.items()):
+        latencies = np.array([event["seconds"] for event in items]) * 1000
+        rows.append({
+            "operation": operation,
+            "calls": len(items),
+            "errors": sum(event["error"] is not None for event in items),
+            "retries": sum(event["retries"] for event in items),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+            "max_ms": round(float(latencies.max()), 1),
+            "rows": sum(event["rows"] for event in items),
+            "bytes": sum(event["bytes"] for event in items),
+        })
+    columns = ["operation", "calls", "errors", "retries", "p50_ms", "p95_ms", "p99_ms", "max_ms", "rows", "bytes"]
+    return pd.DataFrame(rows, columns=columns).set_index("operation")
+
+
+def counters():
+    """
+    Return {(counter, sheet): value}.
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def cache_hit_ratio():
+    """
+    Share of get_df calls answered by the memory cache, or None before the first call.
+    """
+    values = counters()
+    hits = sum(value for (counter, _), value in values.items() if counter == "cache_hit")
+    misses = sum(value for (counter, _), value in values.items() if counter == "cache_miss")
+    if hits + misses == 0:
+        return None
+    return hits / (hits + misses)
+
+
+def recent_errors(limit=10):
+    """
+    The last events that failed, newest first.
+    """
+    with _lock:
+        failed = [event for items in _events.values() for event in items if event["error"] is not None]
+    return sorted(failed, key=lambda event: event["time"], reverse=True)[:limit]
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+
+def sidebar_panel():
+    """
+    Storage metrics of this process on the sidebar. Only called for the admin.
+    """
+    global _exact_sizes_until
+    _exact_sizes_until = time.time() + EXACT_SIZES_FOR
+
+    with st.sidebar.expander("📈 Storage metrics"):
+        ratio = cache_hit_ratio()
+        st.caption("Cache hit ratio: " + ("-" if ratio is None else f"{ratio:.0%}"))
+
+        table = summary()
+        if table.empty:
+            st.caption("No storage calls yet.")
+        else:
+            st.dataframe(table, width="stretch")
+
+        for event in recent_errors(3):
+            moment = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+            st.caption(f"⚠️ {moment} {event['operation']} ({event['sheet']}): {event['error']}")
+
+        if st.button("Reset metrics"):
+            reset()
+            st.rerun()
@@ -1,13 +1,19 @@
 import streamlit as st
-import pandas as pd
 from datetime import date
-from database import get_df
+from database import get_date_index
+from database import get_partition_index
+from database import get_pending
 from database import save_record
-from database import update_record
+from database import update_records
+from database import clear_cache
+import metrics
+from database import write_status
+from config import CATEGORIES
+import paging
+from stopwatch import stopwatch
 import time
 from datetime import datetime
-import pytz
-import time
+from zoneinfo import ZoneInfo
 
 # Set page config
 st.set_page_config(
@@ -38,103 +44,55 @@ if "admin_password" in st.secrets:
         st.sidebar.error("Wrong password 🔒")
 
 
-# Variable to get df
-df = get_df()
+# ----------------------- SIDEBAR & FILTERS -----------------------
+st.sidebar.header("Filters")
 
-# ------- Settings to adjust Visualization & Data Settings -------
-if not df.empty:
-    df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-    df = df.dropna(subset=["Date"])
+# Closed years are on their own archive sheets, only the selected one is read
+periods = {"Current": "database"}
+for archive_sheet in reversed(get_partition_index()["Sheet"].tolist()):
+    periods[archive_sheet.rsplit("_", 1)[-1]] = archive_sheet
+selected_period = st.sidebar.selectbox("Period", list(periods)) if len(periods) > 1 else "Current"
+records_sheet = periods[selected_period]
 
-    df["Date"] = df["Date"].dt.date
-    df["Notes"] = df["Notes"].fillna("").astype(str)
-    df["Duration"] = df["Duration"].fillna(0).astype(int)
-    
-    if "Pages" in df.columns:
-        # Converte vazio para 0 e texto para número
-        df["Pages"] = pd.to_numeric(df["Pages"], errors='coerce').fillna(0).astype(int)
-    
-    if "ID_Google" in df.columns:
-        df["ID_Google"] = pd.to_numeric(df["ID_Google"], errors='coerce').fillna(0).astype(int)
+# Date-sorted index of the cached records: the tables below only copy the rows of one page
+index = get_date_index(records_sheet)
+if index is None:
+    st.stop()
 
-if df.empty:
+# Rows without a date are not on the index
+if len(index["order"]) == 0 and get_pending() is None and len(periods) == 1:
     st.warning("No data found in Google Sheets. Add the first one!")
     st.stop()
 
-
-# ----------------------- SIDEBAR & FILTERS -----------------------
-st.sidebar.header("Filters")
+# Edits of the editor not saved yet, by record id, so they survive a page change.
+# Another period starts without edits
+if "record_edits" not in st.session_state or st.session_state.get("record_edits_sheet") != records_sheet:
+    st.session_state["record_edits"] = {}
+    st.session_state["record_edits_sheet"] = records_sheet
+    for key in [key for key in st.session_state if str(key).startswith("editor_table_")]:
+        del st.session_state[key]
 
 # Create a option list for categories
-categories_list = ["General"] + list(df["Category"].unique())
+categories_list = ["General"] + [category for category, rows in index["by_category"].items() if len(rows) > 0]
 # Create a selection box on the sidebar
 selected_category = st.sidebar.selectbox("Category", categories_list)
-if selected_category != "General":
-    df = df[df["Category"] == selected_category]
+rows = paging.positions(index, None if selected_category == "General" else selected_category)
 
 
 # ----------------------- STOPWATCH -----------------------
 
-@st.fragment(run_every=1)
-def stopwatch():
-    if "running" not in st.session_state:
-        st.session_state.running = False
-    if "start_time" not in st.session_state:
-        st.session_state.start_time = None
-    if "elapsed_total" not in st.session_state:
-        st.session_state.elapsed_total = 0
-
-    with st.container(border=True):
-            
-            c1, c2, c3 = st.columns([2, 1, 1])
-
-            with c1:
-                st.caption("⏱️ Activity Timer")
-
-                if st.session_state.running:
-                    # If it's working, calculate the real time
-                    current_total = time.time() - st.session_state.start_time
-                    minutes = int(current_total // 60)
-                    seconds = int(current_total % 60)
-                else:
-                    # If stopped, show the last saved value
-                    minutes = int(st.session_state.elapsed_total // 60)
-                    seconds = int(st.session_state.elapsed_total % 60)
-                st.markdown(f"## {minutes:02d}:{seconds:02d}")
-
-            with c2:
-                st.write("")
-                if not st.session_state.running:
-                    if st.session_state.elapsed_total < 1:
-                        if st.button("▶️ Start"):
-                            st.session_state.running = True
-                            st.session_state.start_time = time.time()
-                            st.rerun()
-                    else:
-                        st.success("✅ Done!")
+def fill_time_spent(elapsed_seconds):
+    # The stopped time goes to the "Time Spent" input (at least 1 minute)
+    st.session_state["duration_minutes"] = max(1, round(elapsed_seconds / 60))
 
-                else:
-                    if st.button("⏹️ Stop"):
-                        # If stop, calculate the minute total and save
-                        st.session_state.elapsed_total = time.time() - st.session_state.start_time
-                        st.session_state.running = False
-                        st.rerun()
-            
-            with c3:
-                st.write("")
-                if st.button("🔄 Reset"):
-                    st.session_state.elapsed_total = 0
-                    st.session_state.running = False
-                    st.rerun()
-
-stopwatch()
+stopwatch(on_stop=fill_time_spent)
 
 
 # ----------------------- INPUT FORM -----------------------
 with st.container(border=True):
     st.subheader("📝 New record")
 
-    br_timezone = pytz.timezone('America/Sao_Paulo')
+    br_timezone = ZoneInfo('America/Sao_Paulo')
     today_br = datetime.now(br_timezone).date()
 
     # Organizing them into columns to make them visual.
@@ -142,14 +100,14 @@ with st.container(border=True):
 
     with col1:
         register_date = st.date_input("Date", value=today_br, format="DD/MM/YYYY")
-        category = st.selectbox("Category", ["Studies", "English", "Read", "Personal projects", "Workout"])
+        category = st.selectbox("Category", CATEGORIES)
 
     with col2:
         if category == "Read":
             pages = st.number_input("Pages of book", min_value=1, step=2)
         else:
             pages = 0
-        duration = st.number_input("Time Spent (minutes)", min_value=1, step=5)
+        duration = st.number_input("Time Spent (minutes)", min_value=1, step=5, key="duration_minutes")
         notes = st.text_input("Detail of the activity")
 
     # Organizing them into columns to make them visual.
@@ -178,51 +136,108 @@ with st.container(border=True):
     with c3:
         if is_admin:
             if st.button("🔄 Refresh Data"):
-                st.cache_data.clear()
+                clear_cache()
                 st.rerun()
         else:
             st.button("🔄 Refresh Data", disabled=True)
-    
+
+    # Sync status of the write-behind journal (only when it is on)
+    sync_status = write_status()
+    if sync_status is not None:
+        if sync_status["pending"] > 0:
+            st.caption(f"⏳ {sync_status['pending']} record(s) pending | ☁️ {sync_status['flushed']} flushed")
+        else:
+            st.caption(f"☁️ All records flushed ({sync_status['flushed']} in this session)")
+        if sync_status["last_error"]:
+            st.caption(f"⚠️ Last sync error: {sync_status['last_error']}")
 
 
 # ----------------------- LOGIC OF SAVE -----------------------
 if is_admin and submitted:
 
-    br_time = pytz.timezone('America/Sao_Paulo')
+    br_time = ZoneInfo('America/Sao_Paulo')
     time_now = datetime.now(br_time).strftime("%H:%M:%S")
 
     save = save_record(register_date, time_now, category, notes, duration, pages)
     
-    if save:
+    if save and write_status() is not None:
+        # Write-behind mode: the record is on the local journal, no need to wait for Google Sheets
+        st.toast("✅ Record saved! Sending to Database in background.")
+        st.rerun()
+    elif save:
         st.success("✅ Record saved successfully in Database!")
         # Visual efect after save
         st.balloons()
         time.sleep(1)
-        st.cache_data.clear()
         st.rerun()
     else:
         st.error("❌ Error saving record in Database.")
 
 
+# ----------------------- PAGINATION -----------------------
+c1, c2, c3, c4 = st.columns([1, 1, 1, 3])
+
+with c1:
+    page_size = st.selectbox("Rows per page", paging.PAGE_SIZES, index=1)
+total_pages = paging.page_count(len(rows), page_size)
+
+with c2:
+    jump_date = st.date_input("Jump to date", value=None, format="DD/MM/YYYY")
+
+# A new date moves the page number to the page of that date
+if jump_date is not None and jump_date != st.session_state.get("last_jump_date"):
+    st.session_state["records_page"] = paging.page_of_date(index, rows, jump_date, page_size)
+st.session_state["last_jump_date"] = jump_date
+
+# Less rows after a filter: go to the last page that still exists
+if st.session_state.get("records_page", 1) > total_pages:
+    st.session_state["records_page"] = total_pages
+
+with c3:
+    page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="records_page")
+with c4:
+    st.write("")
+    st.caption(f"Page {page} of {total_pages} | {len(rows)} record(s)")
+
+df_page = paging.page_rows(index, rows, page, page_size)
+
+# Records saved in write-behind mode still waiting for the storage
+pending = get_pending()
+if pending is not None:
+    st.caption(f"⏳ {len(pending)} record(s) waiting to be sent to Database")
+    st.dataframe(pending, hide_index=True, column_config={"ID_Google": None, "ID": None})
+
+
 # ----------------------- EDITOR LOGIC -----------------------
+def reset_editor(keep=None):
+    # Forget the edits (except 'keep') and the state of every page editor
+    st.session_state["record_edits"] = keep or {}
+    for key in [key for key in st.session_state if str(key).startswith("editor_table_")]:
+        del st.session_state[key]
+
 if st.session_state["show_editor"]:
     with st.container(border=True):
         if is_admin:
             st.subheader("✏️ Editor of records")
             st.caption("Edit directly in table below and press Enter.")
 
-            df_visual = df.sort_values(by='Date', ascending=False)
+            record_edits = st.session_state["record_edits"]
 
-            df_visual = df_visual.reset_index(drop=True)
-            df_visual["ID_Google"] = df_visual["ID_Google"].astype(int)
+            # Rows of the page with the edits made on other pages or on previous reruns
+            df_visual = df_page.copy()
+            df_visual["Category"] = df_visual["Category"].astype(str)
+            df_visual = paging.apply_edits(df_visual, record_edits)
 
+            # One editor per page: its edited rows are positions of this page
+            editor_key = f"editor_table_{records_sheet}_{selected_category}_{page_size}_{page}"
             df_edited = st.data_editor(
                         df_visual,
                         width="stretch",
                         num_rows="fixed",
-                        key="editor_table",
+                        key=editor_key,
                         column_config={
                             "ID_Google": None,
+                            "ID": None,
                             "Date": st.column_config.DateColumn("Date", format="DD/MM/YYYY", step=1),
                             "Time": st.column_config.TextColumn("Time"),
                             "Category": st.column_config.TextColumn("Category"),
@@ -230,93 +245,69 @@ if st.session_state["show_editor"]:
                             "Duration": st.column_config.NumberColumn("Duration (min)"),
                             "Pages": st.column_config.NumberColumn("Pages")
                         },
-                        hide_index=True,
-                        num_rows="dynamic"
+                        hide_index=True
                     )
             
-            changes = st.session_state["editor_table"]["edited_rows"]
-
-            if len(changes) > 0:
-                st.warning(f"You have changed {len(changes)} record(s). Do you want to save?")
+            changes = st.session_state[editor_key]["edited_rows"]
+
+            # Map the visible rows back to the record ids
+            without_id = 0
+            for index_visual, alterations in changes.items():
+                record_id = df_visual.iloc[index_visual]["ID"]
+                if not record_id:
+                    # Rows still without an id can not be told apart, their edits are not kept
+                    without_id += 1
+                    continue
+                record_edits.setdefault(record_id, {}).update(alterations)
+
+            if without_id:
+                st.warning(f"{without_id} record(s) have no ID yet and can not be edited. Refresh the data and try again.")
+
+            if len(record_edits) > 0:
+                st.warning(f"You have changed {len(record_edits)} record(s). Do you want to save?")
+                if st.button("↩️ Discard changes"):
+                    reset_editor()
+                    st.rerun()
 
             if st.button("💾 Save changes"):
-                progress = st.progress(0)
-                status_txt = st.empty()
-                total_changes = len(changes)
                 erros = 0
-                i = 0
-
-                for index_visual, alterations in changes.items():
-                    i += 1
-                    progress.progress(i/total_changes)
-
-                    try:
-                        current_row = df_visual.iloc[index_visual]
-                        real_id = int(current_row["ID_Google"])
-
-                        status_txt.markdown(f"💾 Saving Row... **Category:** {current_row['Category']} | **ID:** {real_id}")
-                        time.sleep(1)
-
-                        # --- MISTURA DADOS ANTIGOS + NOVOS ---
-                        current_data = current_row.to_dict()
-                        current_data.update(alterations)
-
-                        # Prepara dados para envio
-                        date_val = current_data["Date"]
-                        # Garante formato de string YYYY-MM-DD
-                        if hasattr(date_val, 'strftime'):
-                            date_txt = date_val.strftime("%Y-%m-%d")
-                        else:
-                            date_txt = str(date_val)
-
-                        category_txt = str(current_data["Category"])
-                        notes_txt = str(current_data["Notes"]) if pd.notna(current_data["Notes"]) else ""
-                        time_txt = str(current_data["Time"]) if pd.notna(current_data["Time"]) else ""
-                        page_txt = str(current_data["Pages"]) if pd.notna(current_data["Pages"]) else ""
-
-
-                        try:
-                            dur_int = int(current_data["Duration"])
-                        except:
-                            dur_int = 0
-
-                        # ENVIA PARA O GOOGLE SHEETS
-                        register_data = update_record(
-                            real_row_id=real_id,
-                            date=date_txt,
-                            time=time_txt,
-                            category=category_txt,
-                            notes=notes_txt,
-                            duration=dur_int,
-                            pages=page_txt
-                        )
-                        
-                        if not register_data:
-                            erros += 1
-                            st.error(f"❌ Error saving ID {real_id}.")
-
-                    except Exception as e:
-                        st.error(f"⚠️ Unexpected error on ID {index_visual}: {e}")
-                        erros += 1
-                
-                progress.empty()
-                status_txt.empty()
-                
+
+                # Only the changed fields are sent to Google Sheets
+                batch = list(record_edits.items())
+
+                # ENVIA PARA O GOOGLE SHEETS (one request for every edited row)
+                with st.spinner(f"💾 Saving {len(batch)} row(s)..."):
+                    failed_rows = update_records(batch, records_sheet)
+
+                for real_id, message in failed_rows.items():
+                    st.error(f"❌ Error saving ID {real_id}: {message}")
+                erros += len(failed_rows)
+
+                # The rows that failed stay on the edits, to try again
+                reset_editor({real_id: cells for real_id, cells in record_edits.items() if real_id in failed_rows})
+
                 if erros == 0:
                     st.success("✅ All records updated successfully!")
                     time.sleep(1)
-                    st.cache_data.clear()
                     st.rerun()
                 else:
                     st.warning(f"⚠️ Finished with {erros} error(s).")
         else:
             st.warning("🔒 You are in View Mode.")
-            st.dataframe(df.sort_values(by='Date', ascending=True), use_container_width=True)
+            st.dataframe(df_page, use_container_width=True)
 
 if not st.session_state["show_editor"]:
     st.dataframe(
-        df.sort_values(by='Date', ascending=False),
+        df_page,
         use_container_width=True,
         hide_index=True,
-        column_config={"ID_Google": None}
-    )
\ No newline at end of file
+        column_config={
+            "ID_Google": None,
+            "ID": None,
+            "Date": st.column_config.DateColumn("Date", format="DD/MM/YYYY")
+        }
+    )
+
+# --- ADMIN: STORAGE METRICS ---
+if is_admin:
+    metrics.sidebar_panel()
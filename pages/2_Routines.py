@@ -1,11 +1,15 @@
 import pandas as pd
 import streamlit as st
-from database import get_df
+from database import get_many
 from database import save_book
-import numpy as np
 from datetime import date, datetime as dt
 from database import save_planner
-import pytz
+from database import clear_cache
+from database import get_book_progress
+import metrics
+import partitions
+from analytics import book_progress
+from zoneinfo import ZoneInfo
 
 # Set page config
 st.set_page_config(
@@ -15,39 +19,25 @@ st.set_page_config(
 )
 
 # --- LOAD ALL DATA REQUIRED ---
-df_books = get_df("books_library_d")
-df_database = get_df()
-df_weekly_planner = get_df("weekly_planner")
+# One batched request for the sheets of this page. The records (and the partition index) come in the
+# same request but are not copied here, the reading progress comes from an index kept by database.py
+sheets = get_many(["books_library_d", "weekly_planner"], prefetch=["database", partitions.INDEX_SHEET])
+df_books = sheets["books_library_d"]
+df_weekly_planner = sheets["weekly_planner"]
 
 # --- CONFIGURATION : SESSION STATES ---
 # Set default state to hide the dataframe editor
 if "show_book_editor" not in st.session_state:
     st.session_state["show_book_editor"] = False
+if "show_planner_editor" not in st.session_state:
+    st.session_state["show_planner_editor"] = False
 
 
 # --- CALCULATIONS ---
 
-df_readings = df_database[df_database["Category"] == "Read"].copy()
-total_pages_read = df_readings.groupby("Notes")["Pages"].sum()
-df_books["Pages_Read"] = df_books["Name_book"].map(total_pages_read).fillna(0)
-df_books["Total_pages"] = df_books["Total_pages"].astype(int)
-
-
-
-
-last_read_date = df_database.groupby("Notes")["Date"].max()
-df_books["Last_Activity"] = df_books["Name_book"].map(last_read_date).fillna("")
-df_books["Status_Display"] = np.where(
-    df_books["Pages_Read"] >= df_books["Total_pages"],
-    "✅ Finished (" + df_books["Last_Activity"] + ")",
-    "📖 Reading" 
-)
-
-df_books["Status"] = np.where(
-    df_books["Pages_Read"] >= df_books["Total_pages"], 
-    "Finished", 
-    df_books["Status"]
-)
+# Pages read, last activity, progress and status of every book, from the progress index
+# (kept up to date by database.py, books are matched by a normalized key of the name)
+df_books = book_progress(df_books, get_book_progress())
 
 
 # ---------------- SIDEBAR ----------------
@@ -89,7 +79,7 @@ if not df_weekly_planner.empty:
     days_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     days_week_list = ["All"] + days_week
 
-    br_timezone = pytz.timezone('America/Sao_Paulo')
+    br_timezone = ZoneInfo('America/Sao_Paulo')
     today_num = dt.now(br_timezone).weekday()
     
     default_index = today_num + 1
@@ -157,6 +147,7 @@ with st.container(border=True):
 
     with c3:
         if st.button("🔄 Refresh Data", disabled=not is_admin):
+            clear_cache()
             st.rerun()
 
 
@@ -168,7 +159,6 @@ if  st.session_state["show_book_editor"] == True:
     st.caption("Edit directly in table below and press Enter.")
     df_visual = df_books.sort_values(by='Name_book', ascending=True)
     df_visual = df_visual.reset_index(drop=True)
-    df_visual["ID_Google"] = df_visual["ID_Google"].astype(int)
     st.data_editor(
         df_visual,
         width="stretch",
@@ -178,16 +168,16 @@ if  st.session_state["show_book_editor"] == True:
     
 elif st.session_state["show_book_editor"] == False:
 
-    df_books["Percentage"] = ((df_books["Pages_Read"] / df_books["Total_pages"]) * 100).fillna(0)
-
     st.dataframe(
         df_books,
         use_container_width=True,
         hide_index=True,
         column_config={
             "ID_Google" : None,
+            "ID" : None,
             "Last_Activity" : None,
             "Status" : None,
+            "Finished" : None,
             "Percentage": st.column_config.ProgressColumn(
                 "Progress",
                 help="Reading progress",
@@ -204,6 +194,14 @@ elif st.session_state["show_book_editor"] == False:
 st.divider()
 st.header("📅 Weekly Master Plan")
 
+# Result of the last save, kept across the rerun that reloads the planner
+planner_report = st.session_state.pop("planner_report", None)
+if planner_report is not None:
+    st.success(
+        f"Updated Planner! {planner_report['inserted']} added, "
+        f"{planner_report['changed']} changed, {planner_report['deleted']} removed."
+    )
+
 # 1. ÁREA DE VISUALIZAÇÃO (Aqui usamos o filtro da Sidebar com segurança)
 if selected_day_filter != "All":
     st.info(f"Visualizing Focus: **{selected_day_filter}**")
@@ -213,7 +211,12 @@ if selected_day_filter != "All":
     edit_button = st.button("Edit data", disabled=not is_admin)
 else:
     if is_admin == True:
-        if st.button("Edit data", disabled=not is_admin):
+        planner_button = "❌ Close Editor" if st.session_state["show_planner_editor"] else "Edit data"
+        if st.button(planner_button):
+            st.session_state["show_planner_editor"] = not st.session_state["show_planner_editor"]
+            st.rerun()
+
+        if st.session_state["show_planner_editor"]:
 
             # 2. ÁREA DE EDIÇÃO (Sempre mostra TUDO para garantir salvamento seguro)
             st.subheader("📝 Edit Full Plan")
@@ -248,12 +251,21 @@ else:
                     )
                 },
                 num_rows="dynamic",
-                hide_index=True
+                hide_index=True,
+                key="planner_editor"
             )
 
             if st.button("💾 Save changes"):
 
+                # Only the added, changed and removed rows are sent
                 saved = save_planner(edited_planner)
                 
                 if saved:
-                    st.success("Updated Planner!")
\ No newline at end of file
+                    st.session_state["planner_report"] = saved
+                    # The planner is downloaded again, the editor starts from the saved rows
+                    del st.session_state["planner_editor"]
+                    st.rerun()
+
+# --- ADMIN: STORAGE METRICS ---
+if is_admin:
+    metrics.sidebar_panel()
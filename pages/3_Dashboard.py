@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-from database import get_df
-from datetime import date,timedelta, datetime
+from database import get_daily_rollup
+from database import get_streak_runs
+from streaks import streak_summary
+import analytics
+import rollup
+from config import kpi_cards
+from datetime import date, datetime
 import calendar
-import altair as alt
-import pytz
+from zoneinfo import ZoneInfo
 
 # Set page config
 
@@ -14,36 +18,50 @@ st.title(f"📊 Performance Dashboard")
 
 st.markdown("---")
 
-df= get_df()
-
 # --- Functions (Backend) ---
+# Daily rollup: one row per (Date, Category) with minutes, pages and sessions, kept up to date by database.py
 with st.spinner("Loading data from cloud..."):
-    df = get_df()
+    df = get_daily_rollup()
 
 if df.empty:
     st.warning("No data found in Google Sheets. Add the first one!")
     st.stop()
 
-# Data processing
-df["Date"] = pd.to_datetime(df["Date"])
-df["Duration"] = pd.to_numeric(df["Duration"], errors='coerce').fillna(0).astype(int)
-df["Duration"] = df["Duration"].fillna(0).astype(int)
-
 month_list = calendar.month_name[1:]
 
 # ------------- SIDEBAR & FILTERS -------------
 
 st.sidebar.header("Date filters")
 
-selected_year = st.sidebar.number_input("Year", value=today.year)
+# Month: one calendar month. Range: the last days, the quarter, the year or any dates
+view_mode = st.sidebar.radio("View", ["Month", "Range"], horizontal=True)
 
-default_index = today.month - 1
+if view_mode == "Month":
+    selected_year = st.sidebar.number_input("Year", value=today.year)
 
-selected_month_name = st.sidebar.selectbox("Month", month_list, index=default_index)
-selected_month_number = month_list.index(selected_month_name) + 1
+    default_index = today.month - 1
 
-df_monthly = df[(df["Date"].dt.month == selected_month_number) & (df["Date"].dt.year == selected_year)]
-month_days = calendar.monthrange(selected_year, selected_month_number)[1]
+    selected_month_name = st.sidebar.selectbox("Month", month_list, index=default_index)
+    selected_month_number = month_list.index(selected_month_name) + 1
+
+    month_days = calendar.monthrange(selected_year, selected_month_number)[1]
+    start_date = pd.Timestamp(selected_year, selected_month_number, 1)
+    end_date = pd.Timestamp(selected_year, selected_month_number, month_days)
+else:
+    selected_preset = st.sidebar.selectbox("Period", analytics.RANGE_PRESETS + ["Custom"])
+    if selected_preset == "Custom":
+        picked = st.sidebar.date_input(
+            "Dates", value=(today - pd.Timedelta(days=29), today), format="DD/MM/YYYY"
+        )
+        # While the second date is not picked yet the input has only one
+        if len(picked) < 2:
+            st.info("Pick the last day of the range.")
+            st.stop()
+        start_date, end_date = pd.Timestamp(picked[0]), pd.Timestamp(picked[1])
+    else:
+        start_date, end_date = analytics.preset_range(selected_preset, today)
+
+period_days = (end_date - start_date).days + 1
 
 st.sidebar.header("Topics filters")
 
@@ -53,82 +71,62 @@ categories_list = ["General"] + list(df["Category"].unique())
 # Create a selection box on the sidebar
 selected_category = st.sidebar.selectbox("Category", categories_list)
 if selected_category != "General":
-    df_monthly = df_monthly[df_monthly["Category"] == selected_category]
+    df = df[df["Category"] == selected_category]
+
+# Rows of the selected period (the rollup has one row per day and category, so this is cheap for years)
+df_period = rollup.between(df, start_date, end_date)
 
 
 # ------------- METRICS & KPI's -------------
 st.subheader("📅 Metrics & KPI's")
 
-def calculate_streak(df, category):
-
-    if df.empty:
-        return 0
-
-    # --- Day Streak metrics ---
-
-    df_category = df[df["Category"] == category].copy()
-
-    # Convert to datetime, without time
-    df_category["Date"] = pd.to_datetime(df_category["Date"]).dt.date
-    # Set function convert column to unique list
-    unique_days = set(df_category["Date"])
-
-    br_timezone = pytz.timezone('America/Sao_Paulo')
-    today = datetime.now(br_timezone).date()
-    current_streak = 0
-    check_date = today
-
-    # Wait a range of one day to start analyze streak
-    if not check_date in unique_days:
-        check_date = check_date - timedelta(days=1)
+# --- Day Streak metrics ---
+# Current and longest streak of every category at once, over the full history (not only the selected month)
+br_timezone = ZoneInfo('America/Sao_Paulo')
+today_br = datetime.now(br_timezone).date()
+streak_table = streak_summary(get_streak_runs(), today_br)
 
-    while check_date in unique_days:
-        current_streak += 1
-        check_date = check_date - timedelta(days=1)
+# Performed minutes, goal, progress and streak of every card in one aggregation
+kpis = analytics.kpi_table(df_period, kpi_cards(), period_days, streak_table)
+goal_label = "per month" if view_mode == "Month" else f"in {period_days} day(s)"
 
-    return current_streak
-
-def create_kpi_card(icon, title, category, daily_goal, column):
+def create_kpi_card(kpi, column):
     with column:
         with st.container(border=True):
-            st.subheader(icon + " " + title)
+            st.subheader(kpi["icon"] + " " + kpi["title"])
 
-            streak = calculate_streak(df_monthly, category)
-            month_goal = daily_goal * month_days
-            performed = df_monthly[df_monthly['Category'] == category]['Duration'].sum()
+            streak = kpi["streak"]
+            month_goal = kpi["goal"]
+            performed = kpi["performed"]
 
             kpi1, kpi2 = st.columns(2)
 
             with kpi1:
                 st.metric(
                     label="🔥 Streak",
-                    value = f"{streak} day" if streak <= 1 else f"{streak} days"
+                    value = f"{streak} day" if streak <= 1 else f"{streak} days",
+                    help=f"Longest streak: {kpi['longest_streak']} day(s)"
                 )
                 
             with kpi2:
                 hours_done = round(performed/60, 1)
                 hours_goal = round(month_goal/60, 1)
-                delta_val = round(hours_done - hours_goal, 1)
                 
                 st.metric(
                     label="⏱️ Output", 
                     value=f"{hours_done}h",
-                    help=f"Goal: {hours_goal}h per month"
+                    help=f"Goal: {hours_goal}h {goal_label}"
                 )
             
-            progress = performed/month_goal
+            progress = kpi["progress"]
             st.progress(min(progress, 1.0))
             st.caption(f"{int(progress*100)}% completed")
 
-# Create 3 columns to bring Expected x Actual
-cl1,cl2,cl3,cl4,cl5 = st.columns(5)
+# One column per card, the cards come from config.KPI_CARDS
+kpi_columns = st.columns(len(kpis))
 
-# Create cards = icon, title, category, daily_goal, column
-create_kpi_card("📚","Studies", "Studies", 60, cl1)
-create_kpi_card("🌍","English", "English", 30, cl2)
-create_kpi_card("📖","Reading", "Read", 30, cl3)
-create_kpi_card("🛠️","Projects", "Personal projects", 30, cl4)
-create_kpi_card("🏋️‍♂️","Workout", "Workout", 60, cl5)
+for column, (category, kpi) in zip(kpi_columns, kpis.iterrows()):
+    create_kpi_card(kpi, column)
 
 st.markdown("---")
 
@@ -138,51 +136,78 @@ c1, c2 = st.columns([2, 1])
 
 # Groupy by date
 with c1:
-    st.subheader(f"📈 Daily Evolution")
-
-    df_monthly["hours"] = round((df_monthly["Duration"] / 60), 1)
-
-    daily_evolution = df_monthly.groupby(["Date", "Category"])["hours"].sum().unstack(fill_value=0)
-
-    start_date = f"{selected_year}-{selected_month_number:02d}-01"
-    end_date = f"{selected_year}-{selected_month_number:02d}-{month_days}"
-    all_days = pd.date_range(start=start_date, end=end_date, freq='D')
-
-    daily_evolution = daily_evolution.reindex(all_days, fill_value=0)
-
-    daily_evolution.index = daily_evolution.index.strftime("%d")
-
-    st.bar_chart(daily_evolution, y_label="Hours", x_label="Days")
+    if view_mode == "Month":
+        st.subheader(f"📈 Daily Evolution")
+        daily_evolution = analytics.daily_evolution(df_period, start_date, end_date)
+        st.bar_chart(daily_evolution, y_label="Hours", x_label="Days")
+    else:
+        # Long ranges are summed by week or month, a bar per day would be too thin
+        bar_names = {"D": "Days", "W": "Weeks", "MS": "Months"}
+        st.subheader(f"📈 Evolution")
+        evolution = analytics.range_evolution(df_period, start_date, end_date)
+        st.bar_chart(evolution, y_label="Hours", x_label=bar_names[analytics.resample_rule(start_date, end_date)])
 
 # Groupy by category
 with c2:
     st.subheader(f"📊 Time Distribution")
-    category_distribution = df_monthly.groupby("Category")["hours"].mean().round(2).sort_values(ascending=False)
+    # Average hours per session = total minutes / sessions
+    category_distribution = analytics.category_distribution(df_period)
     st.bar_chart(category_distribution, horizontal=True,color="#0c3ac5",
                  x_label="Hours", y_label="Category")
 
 st.markdown("---")
 
-days_order = [
-    "Monday", "Tuesday", "Wednesday", "Thursday", 
-    "Friday", "Saturday", "Sunday"
-]
-
-df_monthly['day_of_week'] = pd.Categorical(
-    df_monthly['Date'].dt.day_name(), 
-    categories=days_order, 
-    ordered=True
-)
-
-weekday_averages = df_monthly.groupby('day_of_week', observed=False)['hours'].mean().round(2)
-chart_data = weekday_averages.reset_index()
-chart_data.columns = ['Day', 'hours']
+if view_mode == "Range":
+    c1, c2 = st.columns(2)
+
+    # Average hours per day of the last 7 / 28 days, the days before the range included
+    with c1:
+        st.subheader("📉 Rolling Averages")
+        averages = analytics.rolling_averages(df, start_date, end_date)
+        if selected_category == "General":
+            window = st.radio("Days", analytics.ROLLING_WINDOWS, horizontal=True, format_func=lambda days: f"{days}-day average")
+            st.line_chart(averages[window], y_label="Hours per day")
+        else:
+            lines = pd.DataFrame({
+                f"{window}-day average": averages[window].get(selected_category, 0.0)
+                for window in analytics.ROLLING_WINDOWS
+            }, index=averages[analytics.ROLLING_WINDOWS[0]].index)
+            st.line_chart(lines, y_label="Hours per day")
+
+    # Same days one year before
+    with c2:
+        st.subheader("📆 Year over Year")
+        comparison = analytics.year_over_year(df, start_date, end_date)
+        total_now, total_before = comparison["hours"].sum(), comparison["last_year"].sum()
+        st.metric(
+            label="Total",
+            value=f"{round(total_now, 1)}h",
+            delta=f"{(total_now / total_before - 1) * 100:+.0f}%" if total_before > 0 else None,
+            help=f"{round(total_before, 1)}h in the same days one year before"
+        )
+        st.bar_chart(analytics.year_over_year_evolution(df, start_date, end_date), stack=False, y_label="Hours")
+        st.dataframe(
+            comparison.assign(change=comparison["change"] * 100),
+            width="stretch",
+            column_config={
+                "hours": st.column_config.NumberColumn("Hours"),
+                "last_year": st.column_config.NumberColumn("Year before"),
+                "change": st.column_config.NumberColumn("Change", format="%+.0f%%"),
+            },
+        )
+
+    st.markdown("---")
+
+chart_data = analytics.weekday_pattern(df_period)
 
 st.subheader("📅 Weekly Performance Pattern")
 st.caption("Which is your most productive day?")
 
+# Only this chart uses altair directly, the import waits until the charts above are on the screen
+import altair as alt
+
 chart = alt.Chart(chart_data).mark_bar(color="#0c3ac5").encode(
-    x=alt.X('Day', sort=days_order, title='Day of Week'),
+    x=alt.X('Day', sort=analytics.DAYS_ORDER, title='Day of Week'),
     y=alt.Y('hours', title='Total Duration (hours)'),
     tooltip=['Day', 'hours']
 )
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def build_date_index(records):
+    """
+    Date-sorted index of the records: positions of the rows ordered by Date (oldest first,
+    same day in sheet order), the rows without a date left out, and the same positions per category.
+    The positions point to 'records', which is kept on the index. The dates and category codes of
+    the ordered rows are kept too, for the date ranges of select().
+    """
+    dates = records["Date"].to_numpy()
+    order = np.flatnonzero(~np.isnat(dates))
+    order = order[np.argsort(dates[order], kind="stable")]
+
+    categories = records["Category"].astype("category")
+    codes = categories.cat.codes.to_numpy()[order]
+    by_category = {
+        str(category): order[codes == code]
+        for code, category in enumerate(categories.cat.categories)
+    }
+    return {
+        "records": records,
+        "order": order,
+        "by_category": by_category,
+        "dates": dates[order],
+        "codes": codes,
+        "categories": [str(category) for category in categories.cat.categories],
+    }
+
+
+def positions(index, category=None):
+    """
+    Positions of the rows of one category (all rows when category is None), oldest first.
+    """
+    if category is None:
+        return index["order"]
+    return index["by_category"].get(category, index["order"][:0])
+
+
+def select(index, date_from=None, date_to=None, categories=None):
+    """
+    Positions of the rows with date_from <= Date <= date_to (None = no limit) and one of the
+    categories (None = all), oldest first. The dates are found by binary search on the sorted
+    dates, so only the rows of the period are looked at.
+    """
+    dates = index["dates"]
+    start, end = 0, len(dates)
+    if date_from is not None:
+        first_day = np.datetime64(pd.Timestamp(date_from).normalize()).astype(dates.dtype)
+        start = np.searchsorted(dates, first_day, side="left")
+    if date_to is not None:
+        next_day = np.datetime64(pd.Timestamp(date_to).normalize() + pd.Timedelta(days=1)).astype(dates.dtype)
+        end = max(np.searchsorted(dates, next_day, side="left"), start)
+
+    rows = index["order"][start:end]
+    if categories is None:
+        return rows
+    wanted = [code for code, category in enumerate(index["categories"]) if category in set(categories)]
+    return rows[np.isin(index["codes"][start:end], wanted)]
+
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+def page_rows(index, rows, page, page_size):
+    """
+    Dataframe of one page, newest first (page 1 has the most recent records).
+    Only these rows are copied.
+    """
+    end = max(len(rows) - (page - 1) * page_size, 0)
+    start = max(end - page_size, 0)
+    visible = rows[start:end][::-1]
+    return index["records"].iloc[visible].reset_index(drop=True)
+
+
+def page_of_date(index, rows, day, page_size):
+    """
+    Page that shows the newest record on or before 'day'.
+    """
+    dates = index["records"]["Date"].to_numpy()[rows]
+    next_day = np.datetime64(pd.Timestamp(day).normalize() + pd.Timedelta(days=1)).astype(dates.dtype)
+    newer = len(rows) - np.searchsorted(dates, next_day, side="left")
+    return min(newer // page_size + 1, page_count(len(rows), page_size))
+
+
+def apply_edits(page, edits):
+    """
+    Show the edits not saved yet ({record id: {column: value}}) on the rows of the page.
+    """
+    page = page.copy()
+    for record_id, cells in edits.items():
+        if not record_id:
+            # Every row without an id has the same "" id
+            continue
+        mask = page["ID"] == record_id
+        if not mask.any():
+            continue
+        for column, value in cells.items():
+            if column == "Date":
+                value = pd.to_datetime(value, errors="coerce")
+            elif column in ("Duration", "Pages"):
+                value = pd.to_numeric(value, errors="coerce")
+                value = 0 if pd.isna(value) else int(value)
+            elif value is None:
+                value = ""
+            page.loc[mask, column] = value
+    return page
@@ -0,0 +1,207 @@
+"""
+Year partitions of the records.
+
+The "database" sheet keeps the open years (hot). Closed years move to one archive sheet per year
+("database_2023"), and the small "database_partitions" sheet says which archive has which dates.
+The pages read the hot sheet as before and the archives only when a query needs their dates; the
+archives are cached for a long time, as they do not change. The daily rollup and the reading log of
+every archive are saved on two sheets of its own ("database_2023_rollup", "database_2023_reading"), so
+the history tables never download the archives.
+
+    python partitions.py                 # move the closed years to their archives
+    python partitions.py --dry-run
+    python partitions.py --hot-years 2   # keep this year and the last one on the hot sheet
+
+An archive run that stops can be started again: rows already copied are not copied twice.
+"""
+import argparse
+import hashlib
+import sys
+from datetime import date
+
+import pandas as pd
+
+import reading
+import rollup
+from config import setting
+from storage import SHEET_COLUMNS, get_backend, sheet_columns
+
+RECORD_COLUMNS = SHEET_COLUMNS["database"]
+
+INDEX_SHEET = "database_partitions"
+INDEX_COLUMNS = SHEET_COLUMNS[INDEX_SHEET]
+
+# Years kept on the hot sheet: 1 = only the current year
+HOT_YEARS = int(setting("hot_years", 1))
+
+
+def archive_name(year):
+    return f"database_{int(year)}"
+
+
+def aggregate_sheets(sheet_name):
+    """
+    Sheets with the daily rollup and the reading log of an archive.
+    """
+    return f"{sheet_name}_rollup", f"{sheet_name}_reading"
+
+
+def covering(index, date_from=None, date_to=None):
+    """
+    Archive sheets of the index with records between date_from and date_to (None = no limit), oldest first.
+    """
+    if index is None or index.empty:
+        return []
+    first = pd.to_datetime(index["First_Date"], errors="coerce")
+    last = pd.to_datetime(index["Last_Date"], errors="coerce")
+    mask = pd.Series(True, index=index.index)
+    if date_from is not None:
+        mask &= last >= pd.Timestamp(date_from).normalize()
+    if date_to is not None:
+        mask &= first <= pd.Timestamp(date_to)
+    return index.loc[mask].sort_values("First_Date")["Sheet"].tolist()
+
+
+def _row_keys(df):
+    """
+    One key per row: hash of its cells plus the number of equal rows before it,
+    so two equal records stay two records.
+    """
+    hashes = pd.util.hash_pandas_object(df.reindex(columns=RECORD_COLUMNS, fill_value="").astype(str), index=False)
+    return hashes.astype(str) + "/" + hashes.groupby(hashes).cumcount().astype(str)
+
+
+def _not_stored(rows, stored):
+    """
+    Rows that are not on the archive yet (a previous run may have copied part of them).
+    """
+    if stored.empty:
+        return rows
+    return rows[~_row_keys(rows).isin(set(_row_keys(stored))).to_numpy()]
+
+
+def _index_entry(sheet_name, records):
+    dates = pd.to_datetime(records["Date"], errors="coerce")
+    return [sheet_name, dates.min().strftime("%Y-%m-%d"), dates.max().strftime("%Y-%m-%d"), len(records)]
+
+
+def aggregates(records):
+    """
+    Daily rollup and reading log of the records of one archive, with integer totals.
+    """
+    daily = rollup.build_rollup(records)
+    daily[["minutes", "pages", "sessions"]] = daily[["minutes", "pages", "sessions"]].round().astype("int64")
+    log = reading.build_log(records)
+    log[["pages", "records"]] = log[["pages", "records"]].round().astype("int64")
+    return daily, log
+
+
+def _stored_form(table):
+    table = table.copy()
+    table["Date"] = pd.to_datetime(table["Date"]).dt.strftime("%Y-%m-%d")
+    return table
+
+
+def aggregates_hash(tables):
+    """
+    Hash of the aggregates of an archive (rollup, log) as they are saved, kept on the partition index.
+    It starts with a letter, like the record ids, so the sheet keeps it as text.
+    """
+    digest = hashlib.sha256()
+    for table in tables:
+        digest.update(pd.util.hash_pandas_object(_stored_form(table).astype(str), index=False).to_numpy().tobytes())
+    return "h" + digest.hexdigest()[:15]
+
+
+def save_aggregates(backend, sheet_name, tables):
+    """
+    Write the aggregates of one archive (rollup, log) on its aggregate sheets and return their hash.
+    Each archive has its own sheets, so saves of different archives never touch the same rows.
+    """
+    for aggregate_sheet, table in zip(aggregate_sheets(sheet_name), tables):
+        backend.create_sheet(aggregate_sheet)
+        backend.replace(aggregate_sheet, _stored_form(table)[sheet_columns(aggregate_sheet)])
+    return aggregates_hash(tables)
+
+
+def read_history(backend):
+    """
+    Raw records of every partition (hot sheet and archives), as the backend reads them.
+    """
+    frames = [backend.read("database")]
+    for sheet_name in covering(backend.read(INDEX_SHEET)):
+        frames.append(backend.read(sheet_name))
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    return pd.concat(frames, ignore_index=True)
+
+
+def archive_closed_years(backend, hot_years=HOT_YEARS, today=None, dry_run=False, out=sys.stdout):
+    """
+    Move the records of the closed years from the hot sheet to their archive sheets.
+    Return {year: number of records moved}.
+    """
+    first_hot_year = (today or date.today()).year - hot_years + 1
+
+    hot = backend.read("database")
+    if hot.empty:
+        return {}
+    dates = pd.to_datetime(hot["Date"], errors="coerce")
+    # Rows without a valid date stay on the hot sheet, where they can be fixed
+    closed = (dates.dt.year < first_hot_year).to_numpy()
+    if not closed.any():
+        print("No closed year on the hot sheet", file=out)
+        return {}
+
+    years = dates[closed].dt.year.astype(int)
+    moved = years.value_counts().sort_index().to_dict()
+    for year, count in moved.items():
+        print(f"{year}: {count} record(s) to {archive_name(year)}", file=out)
+    if dry_run:
+        return moved
+
+    index = backend.read(INDEX_SHEET)
+    # An index of an older version has no Aggregates column: those archives get their aggregates from the app
+    index = index.reindex(columns=INDEX_COLUMNS, fill_value="")
+    entries = {row["Sheet"]: list(row) for _, row in index.iterrows()}
+
+    for year, rows in hot[closed].groupby(years.to_numpy()):
+        sheet_name = archive_name(year)
+        backend.create_sheet(sheet_name)
+        stored = backend.read(sheet_name)
+        missing = _not_stored(rows, stored)
+        if not missing.empty:
+            # Rows read before the ID column existed have no ID yet
+            rows_out = missing.reindex(columns=RECORD_COLUMNS, fill_value="")
+            backend.append_rows(sheet_name, rows_out.astype(object).values.tolist())
+        archived = pd.concat([frame for frame in (stored, missing) if not frame.empty], ignore_index=True)
+        # Aggregates without their hash on the index (a run stopped here) are built again by the app from the archive
+        digest = save_aggregates(backend, sheet_name, aggregates(archived))
+        entries[sheet_name] = _index_entry(sheet_name, archived) + [digest]
+
+    # The index is saved before the rows leave the hot sheet: if the run stops between both steps the
+    # records are read twice until the next run, but never lost
+    backend.create_sheet(INDEX_SHEET)
+    backend.replace(INDEX_SHEET, pd.DataFrame(sorted(entries.values()), columns=INDEX_COLUMNS))
+    backend.apply_diff("database", [], [], hot.loc[closed, "ID_Google"].astype(int).tolist())
+
+    print(f"{int(closed.sum())} record(s) archived, {len(hot) - int(closed.sum())} left on the hot sheet", file=out)
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move the records of closed years to yearly archive sheets.")
+    parser.add_argument("--hot-years", type=int, default=HOT_YEARS, help="years kept on the hot sheet (1 = current year)")
+    parser.add_argument("--dry-run", action="store_true", help="only count the records to move")
+    args = parser.parse_args(argv)
+
+    try:
+        archive_closed_years(get_backend(), args.hot_years, dry_run=args.dry_run)
+    except Exception as e:
+        print(f"Archive stopped: {e}", file=sys.stderr)
+        print("Run the same command again to finish it.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
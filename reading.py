@@ -0,0 +1,86 @@
+import pandas as pd
+
+# One row per (book key, Date): pages read on "Read" records and number of records with that note
+LOG_COLUMNS = ["key", "Date", "pages", "records"]
+
+# One row per book key: the progress shown on the library
+PROGRESS_COLUMNS = ["pages_read", "last_activity"]
+
+
+def book_key(values):
+    """
+    Normalized key of book titles / notes: same text with other case, accents form or spaces
+    gives the same key (" The  Hobbit" -> "the hobbit").
+    """
+    text = pd.Series(values, dtype=object).where(pd.notna(values), "").astype(str)
+    return text.str.normalize("NFKC").str.casefold().str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def _log_rows(records):
+    """
+    Group records (Date, Category, Notes, Pages) by book key and day.
+    """
+    if records is None or records.empty:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+
+    keys = book_key(records["Notes"].to_numpy())
+    is_read = (records["Category"].astype(str) == "Read").to_numpy()
+    rows = pd.DataFrame({
+        "key": keys.to_numpy(),
+        "Date": pd.to_datetime(records["Date"], errors="coerce").dt.normalize().to_numpy(),
+        "pages": pd.to_numeric(records["Pages"], errors="coerce").fillna(0).to_numpy() * is_read,
+        "records": 1,
+    })
+    rows = rows[(rows["key"] != "") & rows["Date"].notna()]
+    return rows.groupby(["key", "Date"], as_index=False).sum()
+
+
+def build_log(records):
+    return _log_rows(records)
+
+
+def apply_changes(log, added=None, removed=None):
+    """
+    Update the log with the added records and without the removed ones (same idea of rollup.apply_changes).
+    Return (new log, keys that changed).
+    """
+    parts = [log]
+    if added is not None and not added.empty:
+        parts.append(_log_rows(added))
+    if removed is not None and not removed.empty:
+        negative = _log_rows(removed)
+        negative[["pages", "records"]] *= -1
+        parts.append(negative)
+
+    changes = [part for part in parts[1:] if not part.empty]
+    if not changes:
+        return log, set()
+    keys = set().union(*(set(part["key"]) for part in changes))
+
+    merged = pd.concat([part for part in parts if not part.empty], ignore_index=True)
+    merged = merged.groupby(["key", "Date"], as_index=False).sum()
+    # A day without records of the book is gone
+    return merged[merged["records"] > 0].reset_index(drop=True), keys
+
+
+def build_progress(log, keys=None):
+    """
+    Progress per book key: pages read and the last day with a record of the book.
+    keys: only these keys (used to refresh the touched books).
+    """
+    if keys is not None:
+        log = log[log["key"].isin(keys)]
+    if log.empty:
+        return pd.DataFrame(columns=PROGRESS_COLUMNS, index=pd.Index([], name="key"))
+    return log.groupby("key").agg(pages_read=("pages", "sum"), last_activity=("Date", "max"))
+
+
+def update_progress(progress, log, keys):
+    """
+    Refresh the progress of the touched keys only.
+    """
+    if not keys:
+        return progress
+    fresh = build_progress(log, keys)
+    kept = progress[~progress.index.isin(keys)]
+    return pd.concat([kept, fresh]) if not kept.empty else fresh
@@ -0,0 +1,63 @@
+import pandas as pd
+
+# One row per (Date, Category) with the totals of the records of that day
+ROLLUP_COLUMNS = ["Date", "Category", "minutes", "pages", "sessions"]
+
+
+def _daily_totals(records):
+    """
+    Group records (Date, Category, Duration, Pages) by day and category.
+    """
+    if records is None or records.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    days = pd.DataFrame({
+        # Convert to datetime, without time
+        "Date": pd.to_datetime(records["Date"], errors="coerce").dt.normalize(),
+        "Category": records["Category"].astype(str),
+        "minutes": pd.to_numeric(records["Duration"], errors="coerce").fillna(0),
+        "pages": pd.to_numeric(records.get("Pages", 0), errors="coerce").fillna(0),
+        "sessions": 1,
+    }).dropna(subset=["Date"])
+
+    return days.groupby(["Date", "Category"], as_index=False, observed=True).sum()
+
+
+def build_rollup(records):
+    """
+    Build the daily rollup from the full records dataframe.
+    """
+    return _daily_totals(records).sort_values("Date", ignore_index=True)
+
+
+def apply_changes(rollup, added=None, removed=None):
+    """
+    Update the rollup in place of rebuilding it: sum the added records and subtract the removed ones.
+    Only the touched (Date, Category) keys change.
+    """
+    parts = [rollup]
+    if added is not None and not added.empty:
+        parts.append(_daily_totals(added))
+    if removed is not None and not removed.empty:
+        negative = _daily_totals(removed)
+        negative[["minutes", "pages", "sessions"]] *= -1
+        parts.append(negative)
+
+    if len(parts) == 1:
+        return rollup
+
+    merged = pd.concat([part for part in parts if not part.empty], ignore_index=True)
+    if merged.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    merged = merged.groupby(["Date", "Category"], as_index=False, observed=True).sum()
+
+    # A day without sessions left has no records anymore
+    return merged[merged["sessions"] > 0].sort_values("Date", ignore_index=True)
+
+
+def between(rollup, start, end):
+    """
+    Rows of the rollup with start <= Date <= end.
+    """
+    mask = (rollup["Date"] >= pd.Timestamp(start)) & (rollup["Date"] <= pd.Timestamp(end))
+    return rollup[mask]
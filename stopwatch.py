@@ -0,0 +1,61 @@
+import os
+import time
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Static component (frontend/stopwatch/index.html): the clock ticks on the browser,
+# the server only reruns when Start, Stop or Reset is clicked.
+_component = components.declare_component(
+    "stopwatch",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "stopwatch"),
+)
+
+
+def _state(key):
+    """
+    Timer state kept on the session, so it survives reruns and page switches.
+    """
+    state_key = f"{key}_state"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = {"running": False, "start_time": None, "elapsed_total": 0.0, "last_event": None}
+    return st.session_state[state_key]
+
+
+def stopwatch(key="stopwatch", on_stop=None):
+    """
+    Draw the activity timer.
+    on_stop(elapsed_seconds) is called when the timer is stopped, before the page reruns.
+    """
+    state = _state(key)
+
+    if state["running"]:
+        elapsed = time.time() - state["start_time"]
+    else:
+        elapsed = state["elapsed_total"]
+
+    event = _component(running=state["running"], elapsed=elapsed, key=key, default=None)
+
+    # The component keeps its last value, so a click is handled only once
+    if not event or event.get("id") == state["last_event"]:
+        return
+    state["last_event"] = event["id"]
+
+    action = event.get("action")
+    if action == "start" and not state["running"]:
+        state["running"] = True
+        state["start_time"] = time.time()
+    elif action == "stop" and state["running"]:
+        # If stop, calculate the total and save
+        state["elapsed_total"] = time.time() - state["start_time"]
+        state["running"] = False
+        if on_stop is not None:
+            on_stop(state["elapsed_total"])
+    elif action == "reset":
+        state["elapsed_total"] = 0.0
+        state["running"] = False
+    else:
+        return
+
+    # Draw the timer again with the new state
+    st.rerun()
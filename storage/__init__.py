@@ -0,0 +1,36 @@
+from config import setting
+from storage.base import ID_COLUMN, SHEET_COLUMNS, StorageBackend, base_sheet, empty_frame, new_id, sheet_columns
+from storage.instrumented import InstrumentedBackend
+
+_backend = None
+
+
+def get_backend():
+    """
+    Return the storage engine chosen by the 'storage_backend' setting: "sheets" (default) or "sqlite".
+    The engine is created once per process and wrapped with the metrics of every call.
+    """
+    global _backend
+
+    if _backend is None:
+        kind = str(setting("storage_backend", "sheets")).lower()
+        if kind == "sqlite":
+            from storage.sqlite import SQLiteBackend
+            _backend = InstrumentedBackend(SQLiteBackend(setting("sqlite_path", "focusdata.sqlite")))
+        elif kind == "sheets":
+            from storage.sheets import SheetsBackend
+            _backend = InstrumentedBackend(SheetsBackend())
+        else:
+            raise ValueError(f"Unknown storage_backend '{kind}', use 'sheets' or 'sqlite'.")
+
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the storage engine of the process (ex: a local database or a fake for benchmarks).
+    """
+    global _backend
+    if backend is not None and not isinstance(backend, InstrumentedBackend):
+        backend = InstrumentedBackend(backend)
+    _backend = backend
@@ -0,0 +1,170 @@
+import re
+import uuid
+
+import pandas as pd
+
+# Columns of every sheet, in the same order as the columns of Google Sheets (A, B, C...)
+SHEET_COLUMNS = {
+    "database": ["Date", "Time", "Category", "Notes", "Duration", "Pages", "ID"],
+    "books_library_d": ["Name_book", "Author", "Total_pages", "Status", "ID"],
+    "weekly_planner": ["Day", "Activity", "Notes", "Time"],
+    # Index of the archived years of the records: which sheet has which dates (see partitions.py), and the
+    # hash of the saved aggregates of each archive ("" = build them again from the archive)
+    "database_partitions": ["Sheet", "First_Date", "Last_Date", "Rows", "Aggregates"],
+    # Daily rollup and reading log of an archive, saved with it on two sheets of its own ("database_2023_rollup",
+    # "database_2023_reading") so the pages never download closed years. No sheet has these two names.
+    "database_rollup": ["Date", "Category", "minutes", "pages", "sessions"],
+    "database_reading": ["key", "Date", "pages", "records"],
+}
+
+# Column with the record id of the sheets that have one: it never changes, while the row of a record
+# (ID_Google) moves when rows are deleted or inserted above it
+ID_COLUMN = "ID"
+
+# Sheets created by the app when first needed: reading one that does not exist yet gives an empty frame
+OPTIONAL_SHEETS = {"database_partitions"}
+
+# Archived years of the records ("database_2023"), same columns as "database"
+ARCHIVE_PATTERN = re.compile(r"^database_(\d{4})$")
+
+# Aggregates of an archive ("database_2023_rollup"), columns of "database_rollup" / "database_reading"
+AGGREGATE_PATTERN = re.compile(r"^database_\d{4}_(rollup|reading)$")
+AGGREGATE_BASES = {"database_rollup", "database_reading"}
+
+
+def base_sheet(sheet_name):
+    """
+    Sheet whose columns and types a sheet uses: "database" for the archives, "database_rollup" /
+    "database_reading" for their aggregates, the sheet itself otherwise.
+    """
+    if ARCHIVE_PATTERN.match(sheet_name):
+        return "database"
+    match = AGGREGATE_PATTERN.match(sheet_name)
+    return f"database_{match.group(1)}" if match else sheet_name
+
+
+def is_optional(sheet_name):
+    """
+    Check if a sheet may not exist yet (see OPTIONAL_SHEETS). The aggregates of an archive are optional too.
+    """
+    return sheet_name in OPTIONAL_SHEETS or AGGREGATE_PATTERN.match(sheet_name) is not None
+
+
+def sheet_columns(sheet_name):
+    return SHEET_COLUMNS[base_sheet(sheet_name)]
+
+
+def new_id():
+    """
+    Id of a new record or book. It starts with a letter: the sheet would read an id of only digits
+    (or digits and one "e") back as a number.
+    """
+    return "r" + uuid.uuid4().hex[:15]
+
+
+def empty_frame(sheet_name):
+    """
+    If database is empty, create a visual database just to show what the model would look like.
+    """
+    return pd.DataFrame(columns=SHEET_COLUMNS.get(base_sheet(sheet_name), SHEET_COLUMNS["database"]))
+
+
+class StorageBackend:
+    """
+    Interface of a storage engine. database.py builds the public operations on top of it:
+    - get_df -> read
+    - save_record / save_book -> append_rows
+    - update_record / update_book / update_records -> update_rows
+    - save_planner -> apply_diff (replace rewrites a whole sheet)
+
+    Every row has an integer id, returned in the 'ID_Google' column, that update_rows uses to find it.
+    It is the position of the row, so records and books also keep a stable id on their ID column.
+    Methods raise exceptions on failure, database.py shows them to the user.
+    """
+
+    name = "base"
+
+    def read(self, sheet_name):
+        """
+        Return all rows of the sheet as a dataframe with the 'ID_Google' column.
+        """
+        raise NotImplementedError
+
+    def read_many(self, sheet_names):
+        """
+        Return {sheet name: dataframe} of several sheets. Backends that can answer
+        with one request override it, the default reads one sheet after the other.
+        """
+        return {sheet_name: self.read(sheet_name) for sheet_name in sheet_names}
+
+    def read_appended(self, sheet_name, last_row_id, header):
+        """
+        Incremental read of an append-only sheet.
+        last_row_id: id of the last row the caller already has, header: its columns.
+        Return a dataframe (with 'ID_Google') starting with the row last_row_id read again
+        (the caller compares it with its copy to find edits or deletions) and then the new rows.
+        Return None when a full read is needed (not supported, header changed, row not found).
+        """
+        return None
+
+    def read_ids(self, sheet_name, row_ids=None):
+        """
+        Return {row id: value of the ID column} of the given rows, or of every row when row_ids is None.
+        Much smaller than read: used to check that the rows still hold the records before a write.
+        """
+        df = self.read(sheet_name)
+        if ID_COLUMN not in df.columns:
+            df[ID_COLUMN] = ""
+        ids = dict(zip(df["ID_Google"].astype(int), df[ID_COLUMN].astype(str)))
+        if row_ids is None:
+            return ids
+        return {int(row_id): ids.get(int(row_id), "") for row_id in row_ids}
+
+    def write_ids(self, sheet_name, ids):
+        """
+        Write the ID column of rows that have none. ids: {row id: new id}.
+        """
+        self.update_rows(sheet_name, [(row_id, {ID_COLUMN: record_id}) for row_id, record_id in ids.items()])
+
+    def create_sheet(self, sheet_name):
+        """
+        Create the sheet with its header when it does not exist yet (archives, partition index).
+        """
+        raise NotImplementedError
+
+    def append_rows(self, sheet_name, rows):
+        """
+        Add rows (lists in the order of SHEET_COLUMNS) at the end of the sheet.
+        Return the list of new ids, or None when the backend can not tell them.
+        """
+        raise NotImplementedError
+
+    def update_rows(self, sheet_name, updates):
+        """
+        Write only the given cells, all together.
+        updates: list of (row id, {column: value}).
+        """
+        raise NotImplementedError
+
+    def replace(self, sheet_name, df):
+        """
+        Overwrite the whole sheet with the dataframe.
+        """
+        raise NotImplementedError
+
+    def apply_diff(self, sheet_name, updates, inserts, deletes):
+        """
+        Apply changes to a sheet at once:
+        updates: list of (row id, {column: value}), inserts: rows (lists in the order of SHEET_COLUMNS)
+        added at the end, deletes: row ids to remove. The ids of the rows below a deleted row may change.
+        Backends override it with one request; the default reads the sheet and replaces it.
+        """
+        columns = sheet_columns(sheet_name)
+        df = self.read(sheet_name).set_index("ID_Google")
+        for row_id, cells in updates:
+            for column, value in cells.items():
+                df.loc[row_id, column] = value
+        df = df.drop(index=list(deletes))
+        if inserts:
+            df = pd.concat([df, pd.DataFrame(inserts, columns=columns)])
+        self.replace(sheet_name, df.reset_index(drop=True)[columns])
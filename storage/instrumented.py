@@ -0,0 +1,80 @@
+import metrics
+from storage.base import StorageBackend
+
+
+class InstrumentedBackend(StorageBackend):
+    """
+    Wrap a storage engine and save a metrics event (latency, rows, bytes, errors) for every call.
+    Other attributes (ex: reset_connection) go to the wrapped engine.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def __getattr__(self, attribute):
+        return getattr(self.backend, attribute)
+
+    def read(self, sheet_name):
+        with metrics.timed("read", sheet_name) as event:
+            df = self.backend.read(sheet_name)
+            event["rows"] = len(df)
+            event["bytes"] = metrics.frame_bytes(df)
+        return df
+
+    def read_many(self, sheet_names):
+        with metrics.timed("read_many", ",".join(sheet_names)) as event:
+            frames = self.backend.read_many(sheet_names)
+            event["rows"] = sum(len(df) for df in frames.values())
+            event["bytes"] = sum(metrics.frame_bytes(df) for df in frames.values())
+        return frames
+
+    def read_appended(self, sheet_name, last_row_id, header):
+        with metrics.timed("read_appended", sheet_name) as event:
+            df = self.backend.read_appended(sheet_name, last_row_id, header)
+            if df is not None:
+                event["rows"] = len(df)
+                event["bytes"] = metrics.frame_bytes(df)
+        return df
+
+    def read_ids(self, sheet_name, row_ids=None):
+        with metrics.timed("read_ids", sheet_name) as event:
+            ids = self.backend.read_ids(sheet_name, row_ids)
+            event["rows"] = len(ids)
+        return ids
+
+    def write_ids(self, sheet_name, ids):
+        with metrics.timed("write_ids", sheet_name) as event:
+            event["rows"] = len(ids)
+            return self.backend.write_ids(sheet_name, ids)
+
+    def create_sheet(self, sheet_name):
+        with metrics.timed("create_sheet", sheet_name):
+            return self.backend.create_sheet(sheet_name)
+
+    def append_rows(self, sheet_name, rows):
+        with metrics.timed("append_rows", sheet_name) as event:
+            event["rows"] = len(rows)
+            event["bytes"] = metrics.rows_bytes(rows)
+            return self.backend.append_rows(sheet_name, rows)
+
+    def update_rows(self, sheet_name, updates):
+        with metrics.timed("update_rows", sheet_name) as event:
+            event["rows"] = len(updates)
+            event["bytes"] = metrics.rows_bytes([cells for _, cells in updates])
+            return self.backend.update_rows(sheet_name, updates)
+
+    def apply_diff(self, sheet_name, updates, inserts, deletes):
+        with metrics.timed("apply_diff", sheet_name) as event:
+            event["rows"] = len(updates) + len(inserts) + len(deletes)
+            event["bytes"] = metrics.rows_bytes([[cells for _, cells in updates], inserts, list(deletes)])
+            return self.backend.apply_diff(sheet_name, updates, inserts, deletes)
+
+    def replace(self, sheet_name, df):
+        with metrics.timed("replace", sheet_name) as event:
+            event["rows"] = len(df)
+            event["bytes"] = metrics.frame_bytes(df)
+            return self.backend.replace(sheet_name, df)
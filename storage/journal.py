@@ -0,0 +1,225 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from storage.base import ID_COLUMN, sheet_columns
+
+# Seconds between two flushes, and the longest wait after repeated failures
+FLUSH_INTERVAL = 2
+MAX_BACKOFF = 60
+
+# Rows sent to the storage per request
+BATCH_SIZE = 200
+
+
+def _row_key(row):
+    """
+    Comparable form of a row, used to find a row that may already be on the storage.
+    """
+    return tuple(str(value) for value in row)
+
+
+class WriteJournal:
+    """
+    Write-behind journal: appends are saved in a local SQLite file and a background thread
+    sends them to the storage in batches.
+
+    Every entry has an idempotency key. Before retrying entries of a request that may have
+    reached the storage (timeout, crash), the worker looks for their record ids on the storage
+    and only sends the missing ones, so a retry never creates duplicated rows.
+    """
+
+    def __init__(self, path, get_backend, on_flushed=None):
+        self.path = path
+        self.get_backend = get_backend
+        # on_flushed(sheet_name, rows, ids) is called after a batch is saved on the storage
+        self.on_flushed = on_flushed
+        self.last_error = None
+        self.flushed_count = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS journal (
+                    seq INTEGER PRIMARY KEY,
+                    key TEXT UNIQUE NOT NULL,
+                    sheet TEXT NOT NULL,
+                    row TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    flushed_at REAL,
+                    row_id INTEGER
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status)")
+
+            # In memory copy of the pending entries, get_df reads it on every rerun
+            self._pending = {
+                seq: {"seq": seq, "key": key, "sheet": sheet, "row": json.loads(row), "attempts": attempts}
+                for seq, key, sheet, row, attempts in conn.execute(
+                    "SELECT seq, key, sheet, row, attempts FROM journal WHERE status = 'pending' ORDER BY seq"
+                )
+            }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # ----------------------- PUBLIC -----------------------
+
+    def add(self, sheet_name, row):
+        """
+        Save the row on the local journal and wake the worker. Return the pending id of the row
+        (negative number, so it never collides with a storage id).
+        """
+        key = uuid.uuid4().hex
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO journal (key, sheet, row, created_at) VALUES (?, ?, ?, ?)",
+                (key, sheet_name, json.dumps(row), time.time())
+            )
+            seq = cursor.lastrowid
+            self._pending[seq] = {"seq": seq, "key": key, "sheet": sheet_name, "row": list(row), "attempts": 0}
+
+        self.start()
+        self._wake.set()
+        return -seq
+
+    def pending_rows(self, sheet_name):
+        """
+        Return [(pending id, row)] of the entries not sent yet.
+        """
+        with self._lock:
+            return [(-entry["seq"], entry["row"]) for entry in self._pending.values() if entry["sheet"] == sheet_name]
+
+    def status(self):
+        """
+        Counters for the UI: entries waiting, entries sent by this process and the last error.
+        """
+        with self._lock:
+            return {"pending": len(self._pending), "flushed": self.flushed_count, "last_error": self.last_error}
+
+    def start(self):
+        """
+        Start the background worker (once per process).
+        """
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="focusdata-journal", daemon=True)
+                self._worker.start()
+
+    # ----------------------- WORKER -----------------------
+
+    def _run(self):
+        backoff = FLUSH_INTERVAL
+        while True:
+            self._wake.wait(timeout=backoff)
+            self._wake.clear()
+            try:
+                self.flush()
+                backoff = FLUSH_INTERVAL
+            except Exception as e:
+                self.last_error = str(e)
+                # Retry with exponential backoff while the storage is unreachable
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def flush(self):
+        """
+        Send the pending entries to the storage, one batch per sheet.
+        """
+        with self._lock:
+            batches = {}
+            for entry in self._pending.values():
+                batches.setdefault(entry["sheet"], []).append(dict(entry))
+
+        for sheet_name, entries in batches.items():
+            for start in range(0, len(entries), BATCH_SIZE):
+                self._flush_batch(sheet_name, entries[start:start + BATCH_SIZE])
+
+        self.last_error = None
+
+    def _flush_batch(self, sheet_name, entries):
+        backend = self.get_backend()
+        done = {}
+
+        # Entries already tried may be on the storage: match them before sending again
+        retried = [entry for entry in entries if entry["attempts"] > 0]
+        if retried:
+            done.update(self._find_stored(backend, sheet_name, retried))
+
+        to_send = [entry for entry in entries if entry["seq"] not in done]
+        if to_send:
+            self._mark_attempt([entry["seq"] for entry in to_send])
+            new_ids = backend.append_rows(sheet_name, [entry["row"] for entry in to_send])
+            for position, entry in enumerate(to_send):
+                done[entry["seq"]] = new_ids[position] if new_ids else None
+
+        self._mark_flushed(done)
+
+        if self.on_flushed is not None:
+            flushed = [entry for entry in entries if entry["seq"] in done]
+            ids = [done[entry["seq"]] for entry in flushed]
+            self.on_flushed(sheet_name, [entry["row"] for entry in flushed], None if None in ids else ids)
+
+    def _find_stored(self, backend, sheet_name, entries):
+        """
+        Return {seq: row id} of the entries already on the storage. Rows are matched by their record
+        id (only the ID column is downloaded). Rows without id (sheets without the column, entries of
+        an older version) are matched by content, one stored row per entry.
+        """
+        columns = sheet_columns(sheet_name)
+        position = columns.index(ID_COLUMN) if ID_COLUMN in columns else None
+
+        def record_id(row):
+            return str(row[position]) if position is not None and position < len(row) else ""
+
+        found = {}
+        with_id = [entry for entry in entries if record_id(entry["row"])]
+        if with_id:
+            stored = {value: row_id for row_id, value in backend.read_ids(sheet_name).items() if value}
+            for entry in with_id:
+                row_id = stored.get(record_id(entry["row"]))
+                if row_id is not None:
+                    found[entry["seq"]] = int(row_id)
+
+        without_id = [entry for entry in entries if not record_id(entry["row"])]
+        if without_id:
+            stored = backend.read(sheet_name)
+            content = [column for column in columns if column != ID_COLUMN and column in stored.columns]
+            stored_rows = {}
+            claimed = set(found.values())
+            for row_id, values in zip(stored["ID_Google"], stored[content].itertuples(index=False)):
+                if int(row_id) not in claimed:
+                    stored_rows.setdefault(_row_key(values), []).append(int(row_id))
+            for entry in without_id:
+                values = [value for column, value in zip(columns, entry["row"]) if column in content]
+                rows = stored_rows.get(_row_key(values))
+                if rows:
+                    found[entry["seq"]] = rows.pop(0)
+        return found
+
+    def _mark_attempt(self, seqs):
+        with self._lock, self._connect() as conn:
+            conn.executemany("UPDATE journal SET attempts = attempts + 1 WHERE seq = ?", [(seq,) for seq in seqs])
+            for seq in seqs:
+                if seq in self._pending:
+                    self._pending[seq]["attempts"] += 1
+
+    def _mark_flushed(self, done):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE journal SET status = 'flushed', flushed_at = ?, row_id = ? WHERE seq = ?",
+                [(now, row_id, seq) for seq, row_id in done.items()]
+            )
+            for seq in done:
+                self._pending.pop(seq, None)
+            self.flushed_count += len(done)
@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import metrics
+
+# HTTP status codes worth a retry: quota (429) and temporary server errors
+QUOTA_STATUS = 429
+SERVER_STATUS = (500, 502, 503, 504)
+
+# Priority of the calls: the lower number goes first when both wait for a token
+READ = 0
+WRITE = 1
+
+
+def _status(error):
+    """
+    HTTP status of an exception (googleapiclient keeps it inside 'resp'), or None.
+    """
+    for source in (getattr(error, "resp", None), error):
+        status = getattr(source, "status", None) or getattr(source, "status_code", None)
+        if status is not None:
+            try:
+                return int(status)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def is_retryable(error, idempotent=True):
+    """
+    A quota error never reached the sheet, so it can always be retried.
+    Server and network errors may have been applied: only idempotent calls are retried.
+    """
+    status = _status(error)
+    if status == QUOTA_STATUS:
+        return True
+    if not idempotent:
+        return False
+    return status in SERVER_STATUS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+class TokenBucket:
+    """
+    Rate limit: 'rate' requests per second with bursts of up to 'capacity' requests.
+    Waiting callers are served by priority, then by arrival.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._arrival = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=READ):
+        """
+        Wait for a token. Return the seconds spent waiting.
+        """
+        start = time.monotonic()
+        ticket = (priority, next(self._arrival))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiting[0] == ticket and self.tokens >= 1:
+                        self.tokens -= 1
+                        return time.monotonic() - start
+                    # Time until the next token, the head of the queue takes it
+                    self._condition.wait(timeout=max((1 - self.tokens) / self.rate, 0.01))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+
+class _Call:
+    """
+    A read running now, shared by the callers asking for the same thing.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestScheduler:
+    """
+    Central gate of the storage requests:
+    - token bucket rate limit, reads before writes when both are waiting;
+    - retry with jittered exponential backoff on quota (429) and server (5xx) errors;
+    - identical reads running at the same time are sent once and share the result.
+    """
+
+    def __init__(self, requests_per_minute=60, burst=10, max_retries=5, base_delay=1.0, max_delay=32.0):
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """
+        Full jitter: a random wait between 0 and base_delay * 2^attempt (limited to max_delay).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def submit(self, function, priority=READ, key=None, idempotent=True):
+        """
+        Run function() under the rate limit, with retries.
+        key: identity of a read (ex: ("read", "database")). The result is shared with the callers of
+        the same key, so it must not be changed in place.
+        """
+        if key is None:
+            return self._execute(function, priority, idempotent)
+
+        with self._lock:
+            call = self._inflight.get(key)
+            owner = call is None
+            if owner:
+                call = self._inflight[key] = _Call()
+
+        if not owner:
+            metrics.count("coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._execute(function, priority, idempotent)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _execute(self, function, priority, idempotent):
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire(priority)
+            if waited > 0.001:
+                metrics.count("throttle_ms", value=round(waited * 1000))
+            try:
+                return function()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e, idempotent):
+                    raise
+                metrics.retry("quota" if _status(e) == QUOTA_STATUS else "server")
+                time.sleep(self.backoff(attempt))
+                attempt += 1
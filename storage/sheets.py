@@ -0,0 +1,457 @@
+import json
+import numbers
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+import metrics
+from config import setting
+from storage.base import ID_COLUMN, StorageBackend, empty_frame, is_optional, sheet_columns
+from storage.scheduler import READ, WRITE, RequestScheduler
+
+SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1ADvnbbl6a3AzkguJ_Qeua3PoV0n0hxJgxrvDITsCa7k/edit?gid=0#gid=0"
+
+# Google access tokens live for one hour, so the pool re-authorizes a bit before that.
+TOKEN_LIFETIME = 55 * 60
+
+# Sheets API quota: 60 requests per minute per user. Every call of this process waits its turn.
+REQUESTS_PER_MINUTE = float(setting("sheets_requests_per_minute", 60))
+REQUEST_BURST = int(setting("sheets_request_burst", 10))
+MAX_RETRIES = int(setting("sheets_max_retries", 5))
+BACKOFF_BASE = float(setting("sheets_backoff_base", 1.0))
+
+
+def _authorize():
+    """
+    Function:
+    Check if 'credentials.json' exists (Local Use on PC).
+    Otherwise use the service account saved on st.secrets (Streamlit Cloud).
+    Return an authorized pygsheets client.
+    """
+    # pygsheets and the Google API client take about a second to import: only the first connection pays it
+    import pygsheets
+
+    # STRATEGY 1: (Local Use on PC)
+    if os.path.exists("credentials.json"):
+        return pygsheets.authorize(service_file="credentials.json")
+
+    # STRATEGY 2: (Cloud Mode - Streamlit CLoud) - Use st.secrets
+    # Pygsheets needs a JSON string, so we converted the secrets dictionary.
+    if "gcp_service_account" in st.secrets:
+        service_account_info = st.secrets["gcp_service_account"]
+        # Convert the dictionary back to a JSON text
+        json_creds = json.dumps(dict(service_account_info))
+        return pygsheets.authorize(service_account_json=json_creds)
+
+    raise RuntimeError("Credentials.json file not found and secrets not previous config.")
+
+
+def _is_auth_error(error):
+    """
+    Check if an exception means that the token expired or was revoked.
+    """
+    # googleapiclient HttpError keeps the status code inside 'resp'
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status == 401:
+        return True
+    # google.auth RefreshError and pygsheets AuthenticationError
+    return type(error).__name__ in ("RefreshError", "AuthenticationError")
+
+
+def _numericise_all(values):
+    """
+    Same conversion of pygsheets numericise_all (used by get_as_df): int, else float, else the text.
+    Kept here so reading values does not import pygsheets.
+    """
+    converted = []
+    for value in values:
+        if isinstance(value, str) and value != "":
+            try:
+                value = int(value)
+            except ValueError:
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+        converted.append(value)
+    return converted
+
+
+def _column_letter(position):
+    """
+    Convert a zero based column position to the sheet letter (0 -> A, 5 -> F).
+    """
+    return chr(ord("A") + position)
+
+
+def _column_runs(columns, cells):
+    """
+    Group the changed columns of a row in runs of neighbour columns: [(first, last) positions].
+    """
+    positions = sorted(columns.index(column) for column in cells)
+    runs = []
+    for position in positions:
+        if runs and position == runs[-1][1] + 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return [tuple(run) for run in runs]
+
+
+def _cell_data(value):
+    """
+    CellData of the Sheets API for one value (numbers stay numbers, "" clears the cell).
+    """
+    if isinstance(value, numbers.Number) and not isinstance(value, bool) and not pd.isna(value):
+        return {"userEnteredValue": {"numberValue": float(value)}}
+    if value is None or value == "" or (not isinstance(value, str) and pd.isna(value)):
+        return {}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def _row_blocks(row_ids):
+    """
+    Contiguous blocks of row numbers, last block first: [(first, last)].
+    Deleting from the bottom keeps the numbers of the blocks above valid.
+    """
+    blocks = []
+    for row_id in sorted(set(row_ids)):
+        if blocks and row_id == blocks[-1][1] + 1:
+            blocks[-1][1] = row_id
+        else:
+            blocks.append([row_id, row_id])
+    return [tuple(block) for block in reversed(blocks)]
+
+
+def _fingerprint(values, width):
+    """
+    Comparable form of a sheet row: 'width' cells as text, the empty trailing cells included.
+    """
+    cells = [str(value) for value in list(values)[:width]]
+    return tuple(cells + [""] * (width - len(cells)))
+
+
+class SheetsBackend(StorageBackend):
+    """
+    Google Sheets storage (pygsheets).
+    Keeps a process-wide connection pool: the client, the opened spreadsheet and one handle per worksheet.
+    Streamlit re-runs the pages but keeps this object alive, so the pool survives every rerun.
+    """
+
+    name = "sheets"
+
+    def __init__(self, url=SPREADSHEET_URL, authorize=_authorize, scheduler=None):
+        self.url = url
+        self.authorize = authorize
+        self.scheduler = scheduler or RequestScheduler(
+            REQUESTS_PER_MINUTE, REQUEST_BURST, MAX_RETRIES, BACKOFF_BASE
+        )
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._authorized_at = 0.0
+        self._lock = threading.Lock()
+
+    # ----------------------- CONNECTION POOL -----------------------
+
+    def reset_connection(self):
+        """
+        Drop every pooled handle, the next call authorizes again.
+        """
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._worksheets = {}
+            self._authorized_at = 0.0
+
+    def _token_expired(self):
+        return time.time() - self._authorized_at > TOKEN_LIFETIME
+
+    def get_worksheet(self, sheet_name):
+        """
+        Return the worksheet handle of the pool (auth + open happen once per process).
+        If the pool is empty or the token expired, it connects to my Google Sheets file via the Google Cloud API.
+        """
+        with self._lock:
+            worksheet = self._worksheets.get(sheet_name)
+            if worksheet is not None and not self._token_expired():
+                return worksheet
+
+            if self._spreadsheet is None or self._token_expired():
+                # Via my credentials, get my google sheets
+                with metrics.timed("authorize", sheet_name):
+                    self._client = self.authorize()
+                    self._spreadsheet = self._client.open_by_url(self.url)
+                self._worksheets = {}
+                self._authorized_at = time.time()
+
+            # Get my database from specific sheet
+            worksheet = self._spreadsheet.worksheet_by_title(sheet_name)
+            self._worksheets[sheet_name] = worksheet
+
+            return worksheet
+
+    def run(self, sheet_name, action, priority=READ, key=None, idempotent=True):
+        """
+        Run action(worksheet) with the pooled handle, through the request scheduler
+        (rate limit, backoff on 429/5xx, coalescing of the reads with the same key).
+        If the call fails with an auth error, refresh the pool and try once more.
+        """
+        def call():
+            try:
+                return action(self.get_worksheet(sheet_name))
+            except Exception as e:
+                if not _is_auth_error(e):
+                    raise
+                metrics.retry("auth")
+                self.reset_connection()
+                return action(self.get_worksheet(sheet_name))
+
+        return self.scheduler.submit(call, priority=priority, key=key, idempotent=idempotent)
+
+    # ----------------------- OPERATIONS -----------------------
+
+    def read(self, sheet_name):
+        # Transforms my records into a dataframe
+        try:
+            df = self.run(sheet_name, lambda sheet: sheet.get_as_df(has_header=True), key=("read", sheet_name))
+        except Exception as e:
+            # pygsheets WorksheetNotFound: the partition index only exists after the first archive
+            if is_optional(sheet_name) and type(e).__name__ == "WorksheetNotFound":
+                return empty_frame(sheet_name)
+            raise
+
+        if df.empty:
+            return empty_frame(sheet_name)
+
+        # The same answer may be shared by coalesced reads, so the id column goes on a copy
+        df = df.copy()
+        # (Pandas starts in 0, Excel starts in 1 + 1 from header = +2)
+        df["ID_Google"] = df.index + 2
+        return df
+
+    def read_many(self, sheet_names):
+        # One batched values request for every sheet, instead of one get_as_df per sheet
+        def fetch(sheet):
+            present = [sheet_name for sheet_name in sheet_names if self._exists(sheet.spreadsheet, sheet_name)]
+            labels = [f"'{sheet_name}'" for sheet_name in present]
+            return present, sheet.client.get_range(sheet.spreadsheet.id, value_ranges=labels) if labels else []
+
+        if not sheet_names:
+            return {}
+        # The request goes through a sheet that always exists (the optional ones may not)
+        anchor = next((sheet_name for sheet_name in sheet_names if not is_optional(sheet_name)), "database")
+        present, results = self.run(anchor, fetch, key=("read_many", tuple(sheet_names)))
+
+        # Optional sheets not created yet (partition index before the first archive) are empty
+        frames = {sheet_name: empty_frame(sheet_name) for sheet_name in sheet_names}
+        for sheet_name, values in zip(present, results):
+            frames[sheet_name] = self._values_to_df(sheet_name, values)
+        return frames
+
+    @staticmethod
+    def _exists(spreadsheet, sheet_name):
+        """
+        Check if an optional sheet exists. Other sheets are always there (a missing one fails the read).
+        """
+        if not is_optional(sheet_name):
+            return True
+        return SheetsBackend._has_sheet(spreadsheet, sheet_name)
+
+    @staticmethod
+    def _has_sheet(spreadsheet, sheet_name):
+        """
+        Check the list of worksheets, fetched again when the name is not on the cached one.
+        """
+        if sheet_name in [worksheet.title for worksheet in spreadsheet.worksheets()]:
+            return True
+        try:
+            # Not on the list opened with the pool: look again on the server (it may have been created since)
+            spreadsheet.worksheets("title", sheet_name)
+            return True
+        except Exception as e:
+            if type(e).__name__ == "WorksheetNotFound":
+                return False
+            raise
+
+    @staticmethod
+    def _values_to_df(sheet_name, values):
+        """
+        Same conversion of get_as_df(has_header=True): first row is the header, rows padded and numerized.
+        """
+        if len(values) < 2:
+            return empty_frame(sheet_name)
+
+        width = max(len(row) for row in values)
+        rows = [_numericise_all(list(row) + [""] * (width - len(row))) for row in values]
+        df = pd.DataFrame(rows[1:], columns=rows[0])
+
+        # (Pandas starts in 0, Excel starts in 1 + 1 from header = +2)
+        df["ID_Google"] = df.index + 2
+        return df
+
+    def read_appended(self, sheet_name, last_row_id, header):
+        width = len(header)
+        if last_row_id < 2 or width == 0:
+            return None
+        last_col = _column_letter(width - 1)
+
+        # One batched request: the header, and the last known row with everything after it
+        def fetch(sheet):
+            prefix = f"'{sheet.title}'!"
+            labels = [
+                f"{prefix}A1:{last_col}1",
+                f"{prefix}A{last_row_id}:{last_col}",
+            ]
+            return sheet.client.get_range(sheet.spreadsheet.id, value_ranges=labels)
+
+        header_values, tail_values = self.run(sheet_name, fetch, key=("read_appended", sheet_name, last_row_id))
+
+        # A new, renamed or moved column means the cached frame has the wrong shape
+        if _fingerprint(header_values[0], width) != _fingerprint(header, width):
+            return None
+
+        # The API answers [['']] when the range is empty: the known row was deleted
+        if tail_values == [[""]]:
+            return None
+
+        # Same conversion of get_as_df: pad the rows and numerize the cells
+        rows = [_numericise_all(list(row[:width]) + [""] * (width - len(row))) for row in tail_values]
+        df = pd.DataFrame(rows, columns=list(header))
+        df["ID_Google"] = range(last_row_id, last_row_id + len(rows))
+        return df
+
+    def read_ids(self, sheet_name, row_ids=None):
+        letter = _column_letter(sheet_columns(sheet_name).index(ID_COLUMN))
+
+        # Only the cells of the ID column: the given rows, or the whole column
+        def fetch(sheet):
+            prefix = f"'{sheet.title}'!"
+            if row_ids is None:
+                labels = [f"{prefix}{letter}2:{letter}"]
+            else:
+                labels = [f"{prefix}{letter}{row_id}" for row_id in row_ids]
+            return sheet.client.get_range(sheet.spreadsheet.id, value_ranges=labels)
+
+        key = ("read_ids", sheet_name, None if row_ids is None else tuple(row_ids))
+        results = self.run(sheet_name, fetch, key=key)
+
+        def cell(row):
+            return str(row[0]) if row else ""
+
+        if row_ids is None:
+            return {position + 2: cell(row) for position, row in enumerate(results[0])}
+        return {int(row_id): cell(values[0]) if values else "" for row_id, values in zip(row_ids, results)}
+
+    def write_ids(self, sheet_name, ids):
+        columns = sheet_columns(sheet_name)
+        letter = _column_letter(columns.index(ID_COLUMN))
+
+        # The header too, the sheets of an older version have no ID column
+        ranges = [f"{letter}1"]
+        values = [[[ID_COLUMN]]]
+        for first, last in reversed(_row_blocks(ids)):
+            ranges.append(f"{letter}{first}:{letter}{last}")
+            values.append([[ids[row_id]] for row_id in range(first, last + 1)])
+
+        def write(sheet):
+            if sheet.cols < len(columns):
+                sheet.add_cols(len(columns) - sheet.cols)
+            sheet.update_values_batch(ranges, values)
+
+        self.run(sheet_name, write, priority=WRITE)
+
+    def create_sheet(self, sheet_name):
+        columns = sheet_columns(sheet_name)
+
+        def add(sheet):
+            # Any worksheet of the pool leads to the spreadsheet
+            spreadsheet = sheet.spreadsheet
+            if self._has_sheet(spreadsheet, sheet_name):
+                return
+            try:
+                new_sheet = spreadsheet.add_worksheet(sheet_name, rows=1000, cols=len(columns))
+            except Exception:
+                # "Already exists": another process created it since the check, with its header
+                if self._has_sheet(spreadsheet, sheet_name):
+                    return
+                raise
+            new_sheet.update_values("A1", [columns])
+
+        self.run("database", add, priority=WRITE, idempotent=False)
+
+    def append_rows(self, sheet_name, rows):
+        # The function gets the list of rows, and inserts it without overwriting. This means it will paste into the next blank row.
+        result = self.run(
+            sheet_name,
+            lambda sheet: sheet.append_table(rows, start="A2", dimension="ROWS", overwrite=False),
+            # An append that failed on the server may have been saved, only a 429 is retried here
+            priority=WRITE, idempotent=False
+        )
+        try:
+            first_row = result["updates"]["updatedRange"].start.row
+            return list(range(first_row, first_row + len(rows)))
+        except Exception:
+            return None
+
+    def update_rows(self, sheet_name, updates):
+        columns = sheet_columns(sheet_name)
+        ranges = []
+        values = []
+
+        for google_row_number, cells in updates:
+            # Join neighbour cells of the same row in one range (Ex: "D10:E10")
+            for first, last in _column_runs(columns, cells):
+                ranges.append(f"{_column_letter(first)}{google_row_number}:{_column_letter(last)}{google_row_number}")
+                values.append([[cells[columns[p]] for p in range(first, last + 1)]])
+
+        def write(sheet):
+            if sheet.cols < len(columns):
+                # A sheet of an older version (ex: the partition index before the Aggregates column)
+                sheet.add_cols(len(columns) - sheet.cols)
+                sheet.update_values_batch(["A1"] + ranges, [[columns]] + values)
+            else:
+                sheet.update_values_batch(ranges, values)
+
+        if ranges:
+            self.run(sheet_name, write, priority=WRITE)
+
+    def apply_diff(self, sheet_name, updates, inserts, deletes):
+        columns = sheet_columns(sheet_name)
+
+        # One spreadsheets.batchUpdate: Google applies every request or none of them
+        def send(sheet):
+            requests = []
+            for google_row_number, cells in updates:
+                for first, last in _column_runs(columns, cells):
+                    requests.append({"updateCells": {
+                        "start": {"sheetId": sheet.id, "rowIndex": google_row_number - 1, "columnIndex": first},
+                        "rows": [{"values": [_cell_data(cells[columns[p]]) for p in range(first, last + 1)]}],
+                        "fields": "userEnteredValue",
+                    }})
+            if inserts:
+                requests.append({"appendCells": {
+                    "sheetId": sheet.id,
+                    "rows": [{"values": [_cell_data(value) for value in row]} for row in inserts],
+                    "fields": "userEnteredValue",
+                }})
+            for first, last in _row_blocks(deletes):
+                requests.append({"deleteDimension": {"range": {
+                    "sheetId": sheet.id, "dimension": "ROWS", "startIndex": first - 1, "endIndex": last,
+                }}})
+            if requests:
+                sheet.client.sheet.batch_update(sheet.spreadsheet.id, requests)
+
+        # Deletes are not idempotent, so only a 429 (nothing applied) is retried
+        self.run(sheet_name, send, priority=WRITE, idempotent=False)
+
+    def replace(self, sheet_name, df):
+        def overwrite(sheet):
+            sheet.clear()
+            # The sheet grows when the frame has more rows or columns than it
+            sheet.set_dataframe(df.fillna(""), (1, 1), extend=True)
+
+        self.run(sheet_name, overwrite, priority=WRITE)
@@ -0,0 +1,77 @@
+import json
+import os
+
+try:
+    import pyarrow as pa
+except ImportError:
+    # Snapshots are optional, without pyarrow every start downloads the sheets
+    pa = None
+
+# Key of the version stamp inside the Arrow schema metadata
+STAMP_KEY = b"focusdata"
+
+
+def available():
+    return pa is not None
+
+
+def _path(folder, sheet_name):
+    return os.path.join(folder, f"{sheet_name}.arrow")
+
+
+def save(folder, sheet_name, df, stamp):
+    """
+    Write the typed dataframe as an uncompressed Arrow IPC file (so it can be memory-mapped),
+    with the version stamp (dict) on the schema metadata. The file is replaced atomically.
+    """
+    if pa is None:
+        return False
+
+    os.makedirs(folder, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[STAMP_KEY] = json.dumps(stamp).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = _path(folder, sheet_name)
+    temp_path = path + ".tmp"
+    with pa.OSFile(temp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+    return True
+
+
+def delete(folder, sheet_name=None):
+    """
+    Remove the snapshot of a sheet, or every snapshot of the folder when sheet_name is None.
+    """
+    if sheet_name is not None:
+        paths = [_path(folder, sheet_name)]
+    elif os.path.isdir(folder):
+        paths = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".arrow")]
+    else:
+        paths = []
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def load(folder, sheet_name):
+    """
+    Read a snapshot with memory mapping. Return (dataframe, stamp) or None when there is no usable file.
+    """
+    path = _path(folder, sheet_name)
+    if pa is None or not os.path.exists(path):
+        return None
+
+    try:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        stamp = json.loads((table.schema.metadata or {}).get(STAMP_KEY, b"{}"))
+        return table.to_pandas(), stamp
+    except Exception:
+        # A broken or old file is ignored, the next download writes a new one
+        return None
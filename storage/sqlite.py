@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+from storage.base import (
+    AGGREGATE_BASES, ID_COLUMN, SHEET_COLUMNS, StorageBackend, base_sheet, empty_frame, is_optional, sheet_columns
+)
+
+# Numeric columns of each table (the others are TEXT)
+INTEGER_COLUMNS = {
+    "database": {"Duration", "Pages"},
+    "books_library_d": {"Total_pages"},
+    "weekly_planner": {"Time"},
+    "database_partitions": {"Rows"},
+    "database_rollup": {"minutes", "pages", "sessions"},
+    "database_reading": {"pages", "records"},
+}
+
+# Extra indexes of each table, the records are filtered by date and category on every page
+INDEXES = {
+    "database": ["Date", "Category", "ID"],
+    "books_library_d": ["ID"],
+}
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Local storage in one SQLite file, one table per sheet.
+    'row_id' is the primary key of every table and is returned as 'ID_Google'.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path="focusdata.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            for sheet_name in SHEET_COLUMNS:
+                # The aggregate tables are created per archive
+                if sheet_name not in AGGREGATE_BASES:
+                    self._create(conn, sheet_name)
+
+    def _connect(self):
+        # Streamlit runs every session in its own thread, so connections are not shared
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _create(conn, sheet_name):
+        """
+        Create the table of the sheet and its indexes (archives get the ones of "database").
+        """
+        base = base_sheet(sheet_name)
+        column_sql = ", ".join(
+            f'"{column}" {"INTEGER" if column in INTEGER_COLUMNS.get(base, ()) else "TEXT"}'
+            for column in SHEET_COLUMNS[base]
+        )
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{sheet_name}" (row_id INTEGER PRIMARY KEY, {column_sql})')
+        # Tables of an older version get the new columns (ex: ID), empty
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{sheet_name}")')}
+        for column in SHEET_COLUMNS[base]:
+            if column not in existing:
+                kind = "INTEGER" if column in INTEGER_COLUMNS.get(base, ()) else "TEXT"
+                conn.execute(f'ALTER TABLE "{sheet_name}" ADD COLUMN "{column}" {kind}')
+        for column in INDEXES.get(base, []):
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{sheet_name}_{column}" ON "{sheet_name}" ("{column}")')
+
+    def create_sheet(self, sheet_name):
+        with self._lock, self._connect() as conn:
+            self._create(conn, sheet_name)
+
+    @staticmethod
+    def _has_table(conn, sheet_name):
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+        return conn.execute(query, (sheet_name,)).fetchone() is not None
+
+    @staticmethod
+    def _quoted(columns):
+        return ", ".join(f'"{column}"' for column in columns)
+
+    def read(self, sheet_name):
+        columns = sheet_columns(sheet_name)
+        with self._connect() as conn:
+            if is_optional(sheet_name) and not self._has_table(conn, sheet_name):
+                return empty_frame(sheet_name)
+            df = pd.read_sql_query(
+                f'SELECT {self._quoted(columns)}, row_id AS ID_Google FROM "{sheet_name}" ORDER BY row_id',
+                conn
+            )
+        if df.empty:
+            return empty_frame(sheet_name)
+        return df
+
+    def read_ids(self, sheet_name, row_ids=None):
+        query = f'SELECT row_id, "{ID_COLUMN}" FROM "{sheet_name}"'
+        with self._connect() as conn:
+            if row_ids is None:
+                found = conn.execute(query).fetchall()
+            else:
+                row_ids = [int(row_id) for row_id in row_ids]
+                found = []
+                # SQLite limits the number of parameters of one query
+                for start in range(0, len(row_ids), 500):
+                    chunk = row_ids[start:start + 500]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    found += conn.execute(f"{query} WHERE row_id IN ({placeholders})", chunk).fetchall()
+        found = {row_id: record_id or "" for row_id, record_id in found}
+        if row_ids is None:
+            return found
+        return {row_id: found.get(row_id, "") for row_id in row_ids}
+
+    def append_rows(self, sheet_name, rows):
+        columns = sheet_columns(sheet_name)
+        placeholders = ", ".join("?" for _ in columns)
+        ids = []
+        with self._lock, self._connect() as conn:
+            for row in rows:
+                cursor = conn.execute(
+                    f'INSERT INTO "{sheet_name}" ({self._quoted(columns)}) VALUES ({placeholders})',
+                    list(row)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def _update(self, conn, sheet_name, updates):
+        columns = sheet_columns(sheet_name)
+        for row_id, cells in updates:
+            unknown = set(cells) - set(columns)
+            if unknown:
+                raise ValueError(f"unknown column(s) {sorted(unknown)}")
+            if not cells:
+                continue
+            assignments = ", ".join(f'"{column}" = ?' for column in cells)
+            conn.execute(
+                f'UPDATE "{sheet_name}" SET {assignments} WHERE row_id = ?',
+                list(cells.values()) + [int(row_id)]
+            )
+
+    def update_rows(self, sheet_name, updates):
+        with self._lock, self._connect() as conn:
+            self._update(conn, sheet_name, updates)
+
+    def apply_diff(self, sheet_name, updates, inserts, deletes):
+        columns = sheet_columns(sheet_name)
+        placeholders = ", ".join("?" for _ in columns)
+        # One transaction: the other sessions see the old rows or the new ones, never a mix
+        with self._lock, self._connect() as conn:
+            self._update(conn, sheet_name, updates)
+            conn.executemany(f'DELETE FROM "{sheet_name}" WHERE row_id = ?', [(int(row_id),) for row_id in deletes])
+            conn.executemany(
+                f'INSERT INTO "{sheet_name}" ({self._quoted(columns)}) VALUES ({placeholders})',
+                [list(row) for row in inserts]
+            )
+
+    def replace(self, sheet_name, df):
+        columns = sheet_columns(sheet_name)
+        rows = df.reindex(columns=columns).fillna("").values.tolist()
+        placeholders = ", ".join("?" for _ in columns)
+        # One transaction, readers never see the table empty
+        with self._lock, self._connect() as conn:
+            conn.execute(f'DELETE FROM "{sheet_name}"')
+            conn.executemany(
+                f'INSERT INTO "{sheet_name}" ({self._quoted(columns)}) VALUES ({placeholders})',
+                rows
+            )
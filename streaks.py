@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+RUN_COLUMNS = ["Category", "start", "end", "length"]
+
+
+def streak_runs(daily):
+    """
+    Find every streak (run of consecutive active days) of every category in one pass.
+    daily: rollup with one row per (Date, Category), see rollup.py.
+    Return one row per run: Category, start, end (dates) and length (days).
+    """
+    if daily is None or daily.empty:
+        return pd.DataFrame(columns=RUN_COLUMNS)
+
+    days = daily[["Category", "Date"]].drop_duplicates()
+    days = days.assign(day=days["Date"].values.astype("datetime64[D]").astype(np.int64))
+    days = days.sort_values(["Category", "day"], ignore_index=True)
+
+    category = days["Category"].to_numpy()
+    day = days["day"].to_numpy()
+
+    # A new run starts when the category changes or when a day was skipped
+    new_run = np.ones(len(days), dtype=bool)
+    new_run[1:] = (category[1:] != category[:-1]) | (day[1:] - day[:-1] != 1)
+    run_id = np.cumsum(new_run)
+
+    runs = days.groupby(run_id).agg(
+        Category=("Category", "first"),
+        start=("day", "min"),
+        end=("day", "max"),
+    )
+    runs["length"] = runs["end"] - runs["start"] + 1
+    runs["start"] = pd.to_datetime(runs["start"], unit="D").dt.date
+    runs["end"] = pd.to_datetime(runs["end"], unit="D").dt.date
+    return runs.reset_index(drop=True)[RUN_COLUMNS]
+
+
+def streak_summary(runs, today):
+    """
+    Current and longest streak of each category.
+    The current streak is the run that ends today, or yesterday (the day is not over yet).
+    """
+    if runs is None or runs.empty:
+        return pd.DataFrame(columns=["current_streak", "longest_streak"]).rename_axis("Category")
+
+    longest = runs.groupby("Category")["length"].max()
+
+    yesterday = today - pd.Timedelta(days=1)
+    active = runs[(runs["end"] == today) | (runs["end"] == yesterday)]
+    # If a category has runs ending today and yesterday they are the same run, keep the last one
+    current = active.sort_values("end").groupby("Category")["length"].last()
+
+    summary = pd.DataFrame({"longest_streak": longest})
+    summary["current_streak"] = current.reindex(summary.index).fillna(0).astype(int)
+    return summary[["current_streak", "longest_streak"]]